@@ -4,32 +4,210 @@ import time
 import signal
 import sys
 import os
+import queue
+import threading
+from collections import deque, namedtuple
+
+from nmea import NMEAParser, checksum, scan_sentences, sentence
+from track_log import TrackWriter
+
+# Lector NMEA en segundo plano
+READ_CHUNK = 4096  # Bytes maximos por lectura del puerto
+RING_SENTENCES = 2048  # Sentencias retenidas en el anillo (~20s con todas las NMEA a 10Hz)
+SUBSCRIBER_QUEUE = 4096  # Sentencias pendientes por suscriptor antes de descartar
+MAX_SENTENCE = 512  # Bytes sin fin de linea a partir de los cuales se descarta basura
+
+# Conexion y negociacion de baudrate
+BAUD_RATES = (9600, 115200, 57600, 38400, 19200, 4800)  # Orden de sondeo tras el configurado
+PROBE_TIMEOUT = 1.2  # Espera por baudrate (s): cubre una rafaga NMEA a 1Hz
+PROBE_SENTENCES = 2  # Sentencias con checksum valido para dar por bueno un baudrate
+RETRY_DELAY = 0.5  # Espera entre intentos de conexion fallidos (s)
+UPSHIFT_BAUD = 115200  # Todas las sentencias a 10Hz no caben en 9600 bps
+UPSHIFT_RATE_HZ = 10
+UPSHIFT_SETTLE = 1.0  # Espera tras PMTK220 antes de medir (una epoca a 1Hz)
+LINK_SAMPLE = 2.0  # Segundos de medida del caudal del enlace
+
+# Lotes de comandos PMTK
+COMMAND_TIMEOUT = 0.5  # Espera por intento (s); el MT3339 acusa en decenas de ms
+COMMAND_RETRIES = 2  # Reenvios por comando sin respuesta o fallido
+COMMAND_WINDOW = 4  # Comandos en vuelo a la vez (no desbordar la entrada del GPS)
+
+# Comandos que el MT3339 no acusa con PMTK001: reinicios (responden con los
+# mensajes de arranque $PMTK010/011) y cambio de baudrate. Se envian una sola vez
+NO_ACK_COMMANDS = frozenset((101, 102, 103, 104, 251))
+
+# Flag de $PMTK001,<cmd>,<flag>
+ACK_STATUS = {'0': 'invalido', '1': 'no soportado', '2': 'fallido', '3': 'ok'}
+
+# Configuracion de arranque del MT3339
+BOOT_COMMANDS = (
+    'PMTK314,0,1,0,1,1,5,0,0,0,0,0,0,0,0,0,0,0,0,0',  # RMC, GGA y GSA cada fix, GSV cada 5
+    'PMTK313,1',  # SBAS activado
+    'PMTK301,2',  # Correccion DGPS por WAAS
+    'PMTK286,1',  # Filtro de interferencias (AIC)
+    'PMTK225,0',  # Modo de energia normal
+)
+
+# Resultado de un comando: sentencia enviada, estado ('ok', 'invalido', 'no soportado',
+# 'fallido', 'sin respuesta', 'enviado' si no espera acuse...), flag del acuse,
+# linea de respuesta, intentos y ms desde el primer envio hasta la respuesta
+CommandResult = namedtuple('CommandResult', ['command', 'status', 'flag', 'reply', 'attempts', 'elapsed_ms'])
+
+class NMEAReader:
+    """
+    Hilo lector del puerto serie con anillo de sentencias y suscriptores
+
+    El hilo espera el primer byte con el timeout del puerto y despues lee de
+    una vez todo lo disponible, asi que no hay sondeo con sleep. El flujo se
+    parte en sentencias completas que se guardan en un anillo acotado
+    (numeradas) y se entregan a cada suscriptor, por cola o callback, aunque
+    el hilo principal este bloqueado en input(). Cada bloque leido pasa
+    tambien por NMEAParser: los fixes (FIX_DTYPE) van a sus propios
+    suscriptores y el ultimo queda en last_fix.
+    """
+
+    def __init__(self, ser, ring_size=RING_SENTENCES, preload=b''):
+        self.ser = ser
+        self._preload = preload  # Bytes ya leidos del puerto (sondeo del baudrate)
+        self.ring = deque(maxlen=ring_size)  # (secuencia, timestamp, sentencia)
+        self.sequence = 0  # Sentencias recibidas en total
+        self.dropped = 0  # Sentencias perdidas por colas de suscriptor llenas
+        self.error = None  # Excepcion que detuvo el hilo
+        self.parser = NMEAParser()
+        self.last_fix = None
+        self._subscribers = ()
+        self._fix_subscribers = ()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='nmea-reader', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    @property
+    def alive(self):
+        return self._thread.is_alive()
+
+    def subscribe(self, callback=None, maxsize=SUBSCRIBER_QUEUE, fixes=False):
+        """
+        Registra un consumidor de sentencias (o de fixes)
+
+        Args:
+            callback: Funcion (timestamp, sentencia o fix) llamada desde el hilo
+                      lector (debe ser rapida); None para recibir por una cola
+            maxsize (int): Capacidad de la cola del suscriptor
+            fixes (bool): Recibir fixes parseados (FIX_DTYPE) en vez de sentencias
+
+        Returns:
+            La cola (queue.Queue de (timestamp, sentencia o fix)) o el
+            callback, que sirve para unsubscribe
+        """
+        subscriber = callback if callback is not None else queue.Queue(maxsize)
+        with self._lock:
+            if fixes:
+                self._fix_subscribers = self._fix_subscribers + (subscriber,)
+            else:
+                self._subscribers = self._subscribers + (subscriber,)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not subscriber)
+            self._fix_subscribers = tuple(s for s in self._fix_subscribers if s is not subscriber)
+
+    def recent(self, since=0):
+        """Sentencias del anillo con secuencia mayor que since"""
+        with self._lock:
+            return [entry for entry in self.ring if entry[0] > since]
+
+    def _run(self):
+        pending = b''
+        data = self._preload
+        while not self._stop.is_set():
+            if not data:
+                try:
+                    # Bloquea hasta el primer byte (timeout del puerto) y vacia el resto
+                    data = self.ser.read(min(max(1, self.ser.in_waiting), READ_CHUNK))
+                except Exception as e:
+                    if not self._stop.is_set():
+                        self.error = e
+                    break
+
+                if not data:
+                    continue
+
+            timestamp = time.time()
+            *lines, pending = (pending + data).split(b'\n')
+            if len(pending) > MAX_SENTENCE:
+                pending = b''
+
+            sentences = [line.decode('ascii', errors='ignore').strip() for line in lines]
+            sentences = [sentence for sentence in sentences if sentence]
+            if sentences:
+                with self._lock:
+                    for sentence in sentences:
+                        self.sequence += 1
+                        self.ring.append((self.sequence, timestamp, sentence))
+                self._publish(self._subscribers, timestamp, sentences)
+
+            fixes = self.parser.feed(data)
+            if len(fixes):
+                self.last_fix = fixes[-1]
+                self._publish(self._fix_subscribers, timestamp, fixes)
+            data = b''
+
+    def _publish(self, subscribers, timestamp, items):
+        """Entrega sentencias o fixes a los suscriptores (sin bloquear el lector)"""
+        for subscriber in subscribers:
+            if isinstance(subscriber, queue.Queue):
+                for item in items:
+                    try:
+                        subscriber.put_nowait((timestamp, item))
+                    except queue.Full:
+                        self.dropped += 1
+            else:
+                for item in items:
+                    try:
+                        subscriber(timestamp, item)
+                    except Exception as e:
+                        print(f"Error en suscriptor NMEA: {e}")
 
 class GPSCommander:
     def __init__(self, port='/dev/ttyS0', baud=9600):
         self.port = port
         self.baud = baud
         self.ser = None
+        self.reader = None
+        self.link = None  # Baudrate y tiempos de la ultima conexion
+        self._probe_data = b''
+        self.log_file = None
+        self._log_subscriber = None
+        self.track = None  # TrackWriter del track binario en curso
+        self._track_subscriber = None
         self.connect()
 
     def connect(self):
-        """Conectar con reintentos y limpieza"""
+        """Conectar con reintentos, detectando el baudrate actual del receptor"""
+        self._stop_reader()
         if self.ser and self.ser.is_open:
             try:
                 self.ser.close()
             except:
                 pass
-            time.sleep(1)
 
         max_retries = 3
         for attempt in range(max_retries):
             try:
                 print(f"Intentando conectar ({attempt + 1}/{max_retries})...")
+                started = time.time()
 
-                # Configurar puerto antes de abrir
-                os.system(f'stty -F {self.port} {self.baud} raw -echo')
-                time.sleep(0.5)
-
+                # pyserial configura el puerto con termios (raw, sin eco): sin stty ni esperas
                 self.ser = serial.Serial(
                     port=self.port,
                     baudrate=self.baud,
@@ -37,102 +215,436 @@ class GPSCommander:
                     write_timeout=0.1,
                     exclusive=True  # Evita que otros procesos usen el puerto
                 )
-
-                # Limpiar buffers
-                self.ser.reset_input_buffer()
                 self.ser.reset_output_buffer()
-                time.sleep(0.5)
 
-                print(f"✓ Conectado a {self.port} a {self.baud} bps")
+                baud = self._detect_baud()
+                if not baud:
+                    # Puerto abierto pero sin receptor (o baudrate no soportado): no es una conexion
+                    self.ser.close()
+                    raise IOError(f"sin NMEA valido a ningun baudrate ({', '.join(map(str, BAUD_RATES))})")
+                self.baud = baud
+
+                self.link = {'baud': self.baud, 'detect_ms': (time.time() - started) * 1000,
+                             'first_fix_ms': None, 'first_position_ms': None}
+                self._start_reader(started)
+
+                print(f"✓ Conectado a {self.port} a {self.baud} bps "
+                      f"(deteccion {self.link['detect_ms']:.0f}ms)")
                 return True
 
             except Exception as e:
                 print(f"✗ Error en intento {attempt + 1}: {e}")
                 if attempt < max_retries - 1:
-                    time.sleep(2)
+                    time.sleep(RETRY_DELAY)
                 else:
                     print("No se pudo conectar al GPS")
                     return False
 
+    def _detect_baud(self):
+        """Baudrate al que llegan sentencias validas (primero el configurado), o None"""
+        candidates = [self.baud] + [baud for baud in BAUD_RATES if baud != self.baud]
+        for baud in candidates:
+            self.ser.baudrate = baud
+            if self._probe():
+                return baud
+        return None
+
+    def _probe(self, timeout=PROBE_TIMEOUT):
+        """
+        Hay PROBE_SENTENCES sentencias con checksum valido antes de timeout
+
+        Los bytes leidos desde la primera sentencia valida quedan en
+        _probe_data para que el lector no pierda la primera rafaga.
+        """
+        self.ser.reset_input_buffer()
+        self._probe_data = b''
+        deadline = time.time() + timeout
+        data = b''
+        while time.time() < deadline:
+            data += self.ser.read(min(max(1, self.ser.in_waiting), READ_CHUNK))
+            starts, _, valid, _ = scan_sentences(data)
+            if valid.sum() >= PROBE_SENTENCES:
+                self._probe_data = data[starts[valid][0]:]
+                return True
+            if len(data) > 4 * READ_CHUNK:
+                data = data[-READ_CHUNK:]
+        return False
+
+    def _start_reader(self, started=None):
+        """Arranca el lector (desde aqui solo el toca la entrada del puerto)"""
+        self.reader = NMEAReader(self.ser, preload=self._probe_data).start()
+        self._probe_data = b''
+        if self._log_subscriber:
+            self.reader.subscribe(self._log_subscriber)
+        if self._track_subscriber:
+            self.reader.subscribe(self._track_subscriber, fixes=True)
+        if started is None:
+            return
+
+        # Tiempo hasta el primer registro de fix y hasta la primera posicion
+        link = self.link
+        reader = self.reader
+
+        def first_fix(timestamp, fix):
+            if link['first_fix_ms'] is None:
+                link['first_fix_ms'] = (timestamp - started) * 1000
+            if fix['quality'] > 0 and link['first_position_ms'] is None:
+                link['first_position_ms'] = (timestamp - started) * 1000
+                reader.unsubscribe(first_fix)
+
+        reader.subscribe(first_fix, fixes=True)
+
+    def upshift(self, baud=UPSHIFT_BAUD, rate_hz=UPSHIFT_RATE_HZ):
+        """
+        Sube el baudrate (PMTK251) y la frecuencia de fixes (PMTK220)
+
+        El nuevo enlace se verifica con sentencias validas antes de darlo por
+        bueno (si no, se vuelve al baudrate anterior) y despues midiendo que
+        los fixes llegan a la frecuencia pedida.
+
+        Returns:
+            bool: Enlace verificado al nuevo baudrate y frecuencia
+        """
+        if not self.connected():
+            if not self.reconnect():
+                return False
+
+        if baud != self.baud:
+            # PMTK251 no se acusa: se escribe sin el lector y se cambia el puerto al vaciarse
+            self._stop_reader()
+            self.ser.write(f"{sentence(f'PMTK251,{baud}')}\r\n".encode())
+            self.ser.flush()
+            self.ser.baudrate = baud
+            if not self._probe():
+                print(f"✗ Sin NMEA valido a {baud} bps, se vuelve a {self.baud} bps")
+                self.ser.baudrate = self.baud
+                self._start_reader()
+                return False
+            self.baud = baud
+            self.link['baud'] = baud
+            self._start_reader()
+            print(f"✓ Enlace a {baud} bps")
+
+        result = self.send_commands([f'PMTK220,{round(1000 / rate_hz)}'], verbose=False)[0]
+        if result.status != 'ok':
+            print(f"✗ PMTK220 a {rate_hz}Hz: {result.status}")
+            return False
+
+        # La nueva frecuencia se aplica tras la epoca en curso
+        time.sleep(UPSHIFT_SETTLE)
+        stats = self.throughput()
+        print_throughput(stats)
+        if stats['fixes_s'] < 0.8 * rate_hz:
+            print(f"✗ Solo {stats['fixes_s']:.1f} fixes/s de {rate_hz}Hz pedidos")
+            return False
+        print(f"✓ {rate_hz}Hz a {self.baud} bps")
+        return True
+
+    def throughput(self, duration=LINK_SAMPLE):
+        """Sentencias, fixes y bytes por segundo recibidos durante duration"""
+        reader = self.reader
+        parser = reader.parser
+        start = (time.perf_counter(), reader.sequence, parser.fixes, parser.bytes, parser.checksum_errors)
+        time.sleep(duration)
+        elapsed = time.perf_counter() - start[0]
+
+        bytes_s = (parser.bytes - start[3]) / elapsed
+        return {
+            'baud': self.baud,
+            'sentences_s': (reader.sequence - start[1]) / elapsed,
+            'fixes_s': (parser.fixes - start[2]) / elapsed,
+            'bytes_s': bytes_s,
+            'load': bytes_s * 10 / self.baud,  # 8N1: 10 bits por byte
+            'checksum_errors': parser.checksum_errors - start[4],
+        }
+
+    def link_status(self):
+        """Baudrate, tiempos de conexion y caudal actual del enlace"""
+        if not self.connected():
+            print("Sin conexion")
+            return
+
+        link = self.link
+        times = [f"deteccion {link['detect_ms']:.0f}ms"]
+        for key, name in (('first_fix_ms', 'primer fix'), ('first_position_ms', 'primera posicion')):
+            if link[key] is not None:
+                times.append(f"{name} {link[key]:.0f}ms")
+        print(f"Enlace {self.port} a {self.baud} bps: {', '.join(times)}")
+        print_throughput(self.throughput())
+
     def reconnect(self):
         """Reconectar cuando hay problemas"""
         print("Reconectando...")
         return self.connect()
 
-    def send_command(self, command):
-        if not self.ser or not self.ser.is_open:
+    def connected(self):
+        """Puerto abierto y lector vivo (si el lector murio, informa el motivo)"""
+        if not self.ser or not self.ser.is_open or not self.reader:
+            return False
+        if not self.reader.alive:
+            if self.reader.error:
+                print(f"✗ Lector NMEA detenido: {self.reader.error}")
+            return False
+        return True
+
+    def _stop_reader(self):
+        if self.reader:
+            self.reader.stop()
+            self.reader = None
+
+    def send_commands(self, commands, timeout=COMMAND_TIMEOUT, retries=COMMAND_RETRIES,
+                      window=COMMAND_WINDOW, verbose=True):
+        """
+        Envia un lote de comandos PMTK seguidos y empareja cada respuesta
+
+        El checksum se calcula siempre (nmea.sentence). Se mantienen hasta
+        window comandos en vuelo sin esperar entre ellos; cada
+        $PMTK001,<cmd>,<flag> (o la respuesta de datos PMTK<cmd+100> de las
+        consultas) se asigna al comando mas antiguo en vuelo con ese numero.
+        Sin respuesta en timeout segundos, o con flag 2 (fallido), el comando
+        se reenvia hasta retries veces.
+
+        Args:
+            commands (list): Comandos con o sin '$' y checksum ('PMTK220,100')
+            timeout (float): Espera maxima por intento (s)
+            retries (int): Reenvios permitidos por comando
+            window (int): Comandos en vuelo a la vez (buffer de entrada del GPS)
+            verbose (bool): Mostrar cada envio y respuesta
+
+        Returns:
+            list: CommandResult por comando, en el orden recibido
+        """
+        packets = [sentence(command) for command in commands]
+        if not packets:
+            return []
+
+        if not self.connected():
             if not self.reconnect():
-                return None
+                return [CommandResult(packet, 'sin conexion', None, None, 0, 0.0) for packet in packets]
 
-        try:
-            # Limpiar buffers antes de enviar
-            self.ser.reset_input_buffer()
-            self.ser.reset_output_buffer()
-            time.sleep(0.1)
+        # Numero PMTK de cada comando (None = sin acuse: no se espera ni se reenvia)
+        codes = []
+        for packet in packets:
+            name = packet[1:].split('*')[0].split(',')[0]
+            code = int(name[4:]) if name.startswith('PMTK') and name[4:].isdigit() else None
+            codes.append(None if code in NO_ACK_COMMANDS else code)
+
+        results = [None] * len(packets)
+        attempts = [0] * len(packets)
+        first_sent = [0.0] * len(packets)
+        window = max(1, window)
+        queued = deque(range(len(packets)))
+        in_flight = {}  # indice -> instante limite del intento actual
 
-            # Preparar comando
-            if not command.startswith('$'):
-                command = f'${command}'
+        # Suscribirse antes de enviar para no perder una respuesta rapida
+        replies = self.reader.subscribe()
 
-            # Enviar comando
-            self.ser.write(f'{command}\r\n'.encode())
-            self.ser.flush()  # Asegurar que se envia
-            print(f">> {command}")
+        try:
+            while queued or in_flight:
+                # Llenar la ventana sin esperar entre comandos
+                pending = []
+                while queued and len(in_flight) + len(pending) < window:
+                    index = queued.popleft()
+                    pending.append(index)
+                if pending:
+                    self.ser.write(''.join(f'{packets[index]}\r\n' for index in pending).encode())
+                    now = time.time()
+                    for index in pending:
+                        attempts[index] += 1
+                        first_sent[index] = first_sent[index] or now
+                        if verbose:
+                            print(f">> {packets[index]}")
+                        if codes[index] is None:
+                            results[index] = CommandResult(packets[index], 'enviado', None, None,
+                                                           attempts[index], 0.0)
+                        else:
+                            in_flight[index] = now + timeout
 
-            # Esperar respuesta
-            start_time = time.time()
-            responses = []
+                if not in_flight:
+                    continue
 
-            while time.time() - start_time < 3:
                 try:
-                    if self.ser.in_waiting > 0:
-                        line = self.ser.readline().decode('utf-8', errors='ignore').strip()
-                        if line:
-                            responses.append(line)
-                            if 'PMTK' in line or 'ACK' in line:
-                                print(f"<< {line}")
-                                return line
-                    time.sleep(0.01)
-                except Exception as e:
-                    print(f"Error leyendo: {e}")
-                    break
+                    timestamp, line = replies.get(timeout=max(0.0, min(in_flight.values()) - time.time()))
+                except queue.Empty:
+                    line = None
 
-            if responses:
-                print(f"<< Otras respuestas: {len(responses)} lineas")
-                for resp in responses[-3:]:  # Mostrar las ultimas 3
-                    if resp.strip():
-                        print(f"   {resp}")
-            else:
-                print("<< Sin respuesta")
+                if line:
+                    match = self._match_reply(line, codes, in_flight)
+                    if match:
+                        index, flag = match
+                        del in_flight[index]
+                        status = ACK_STATUS.get(flag, 'ok')
+                        elapsed_ms = (timestamp - first_sent[index]) * 1000
+                        if verbose:
+                            print(f"<< {line}")
+                        if status == 'fallido' and attempts[index] <= retries:
+                            queued.append(index)
+                        else:
+                            results[index] = CommandResult(packets[index], status, flag, line,
+                                                           attempts[index], elapsed_ms)
 
-            return None
+                # Vencidos: reintentar o dar por perdidos
+                now = time.time()
+                for index, deadline in list(in_flight.items()):
+                    if deadline <= now:
+                        del in_flight[index]
+                        if attempts[index] <= retries:
+                            queued.append(index)
+                        else:
+                            results[index] = CommandResult(packets[index], 'sin respuesta', None, None,
+                                                           attempts[index], (now - first_sent[index]) * 1000)
 
         except Exception as e:
-            print(f"✗ Error enviando comando: {e}")
+            print(f"✗ Error enviando comandos: {e}")
             # Intentar reconectar
             self.reconnect()
+        finally:
+            if self.reader:
+                self.reader.unsubscribe(replies)
+
+        return [result or CommandResult(packet, 'error', None, None, tries, 0.0)
+                for packet, result, tries in zip(packets, results, attempts)]
+
+    @staticmethod
+    def _match_reply(line, codes, in_flight):
+        """(indice del comando en vuelo, flag) al que responde line, o None"""
+        if not line.startswith('$PMTK') or '*' not in line:
+            return None
+        body, _, received = line[1:].partition('*')
+        if checksum(body) != received[:2].upper():
             return None
 
+        fields = body.split(',')
+        if fields[0] == 'PMTK001' and len(fields) >= 3 and fields[1].isdigit():
+            code, flag = int(fields[1]), fields[2]
+        elif fields[0][4:].isdigit():
+            code, flag = int(fields[0][4:]) - 100, None  # Respuesta de datos a una consulta
+        else:
+            return None
+
+        # El mas antiguo en vuelo con ese numero (los dict conservan el orden de envio)
+        for index in in_flight:
+            if codes[index] == code:
+                return index, flag
+        return None
+
+    def send_command(self, command):
+        """Envia un comando y devuelve la linea de respuesta (o None)"""
+        result = self.send_commands([command])[0]
+        if result.status not in ('ok', 'enviado'):
+            print(f"<< {result.status}")
+        return result.reply
+
+    def configure(self, commands=BOOT_COMMANDS):
+        """Configuracion de arranque en un solo lote"""
+        start = time.time()
+        results = self.send_commands(commands, verbose=False)
+        elapsed = time.time() - start
+        print_results(results)
+        ok = sum(result.status == 'ok' for result in results)
+        print(f"Configuracion: {ok}/{len(results)} comandos aceptados en {elapsed * 1000:.0f}ms")
+        return results
+
     def monitor(self, duration=5):
-        if not self.ser or not self.ser.is_open:
+        if not self.connected():
             if not self.reconnect():
                 return
 
         print(f"Monitoreando por {duration} segundos... (Ctrl+C para parar)")
+        sentences = self.reader.subscribe()
         try:
-            start_time = time.time()
-            while time.time() - start_time < duration:
-                if self.ser.in_waiting > 0:
-                    line = self.ser.readline().decode('utf-8', errors='ignore').strip()
-                    if line:
-                        print(line)
-                time.sleep(0.01)
+            deadline = time.time() + duration
+            while (remaining := deadline - time.time()) > 0:
+                try:
+                    _, line = sentences.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                print(line)
         except KeyboardInterrupt:
             print("\nMonitoreo detenido")
         except Exception as e:
             print(f"Error monitoreando: {e}")
+        finally:
+            self.reader.unsubscribe(sentences)
+
+        if self.reader.dropped:
+            print(f"Aviso: {self.reader.dropped} sentencias descartadas (consumidores lentos)")
+
+    def status(self):
+        """Muestra el ultimo fix y las estadisticas del parser"""
+        if not self.reader:
+            print("Sin conexion")
+            return
+
+        parser = self.reader.parser
+        print(f"Sentencias validas: {parser.sentences}, errores de checksum: {parser.checksum_errors}, "
+              f"fixes: {parser.fixes}")
+
+        fix = self.reader.last_fix
+        if fix is None:
+            print("Sin fix todavia")
+            return
+
+        when = time.strftime('%H:%M:%S', time.gmtime(fix['time'])) if fix['time'] == fix['time'] else '?'
+        print(f"Fix {when} UTC: {fix['lat']:+.6f}, {fix['lon']:+.6f}, {fix['alt']:.1f}m | "
+              f"calidad {fix['quality']}, modo {fix['mode']}D, sats {fix['sats']}, HDOP {fix['hdop']:.1f}, "
+              f"{fix['speed'] * 3.6:.1f}km/h")
+
+    def start_log(self, filename):
+        """Guardar todas las sentencias recibidas en un archivo (en segundo plano)"""
+        self.stop_log()
+        try:
+            self.log_file = open(filename, 'a', buffering=1 << 16)
+        except OSError as e:
+            print(f"✗ No se pudo abrir {filename}: {e}")
+            return False
+
+        log_file = self.log_file
+        self._log_subscriber = lambda timestamp, sentence: log_file.write(sentence + '\n')
+        if self.reader:
+            self.reader.subscribe(self._log_subscriber)
+        print(f"✓ Guardando NMEA en {filename}")
+        return True
+
+    def stop_log(self):
+        if self._log_subscriber and self.reader:
+            self.reader.unsubscribe(self._log_subscriber)
+        self._log_subscriber = None
+        if self.log_file:
+            self.log_file.close()
+            print(f"✓ Log cerrado: {self.log_file.name}")
+            self.log_file = None
+
+    def start_track(self, filename):
+        """Grabar los fixes parseados en un track binario (track_log.py para consultarlo)"""
+        self.stop_track()
+        try:
+            self.track = TrackWriter(filename)
+        except (OSError, ValueError) as e:
+            print(f"✗ No se pudo abrir {filename}: {e}")
+            return False
+
+        track = self.track
+        self._track_subscriber = lambda timestamp, fix: track.append(fix)
+        if self.reader:
+            self.reader.subscribe(self._track_subscriber, fixes=True)
+        print(f"✓ Grabando track en {filename} ({track.count} fixes previos)")
+        return True
+
+    def stop_track(self):
+        if self._track_subscriber and self.reader:
+            self.reader.unsubscribe(self._track_subscriber)
+        self._track_subscriber = None
+        if self.track:
+            self.track.close()
+            print(f"✓ Track cerrado: {self.track.filename} ({self.track.count} fixes, "
+                  f"{self.track.skipped} sin hora o fuera de orden descartados)")
+            self.track = None
 
     def close(self):
+        self.stop_log()
+        self.stop_track()
+        self._stop_reader()
         if self.ser and self.ser.is_open:
             try:
                 self.ser.close()
@@ -149,6 +661,18 @@ def signal_handler(sig, frame):
         gps.close()
     sys.exit(0)
 
+def print_results(results):
+    """Tabla de resultados de un lote de comandos"""
+    for result in results:
+        elapsed = f"{result.elapsed_ms:6.0f}ms" if result.reply else ' ' * 8
+        print(f"   {result.status:<13} {elapsed} x{result.attempts}  {result.command}")
+
+def print_throughput(stats):
+    """Caudal medido del enlace"""
+    print(f"   {stats['sentences_s']:.1f} sentencias/s, {stats['fixes_s']:.1f} fixes/s, "
+          f"{stats['bytes_s']:.0f} B/s ({stats['load'] * 100:.0f}% de {stats['baud']} bps), "
+          f"{stats['checksum_errors']} errores de checksum")
+
 def reset_port():
     """Funcion para resetear el puerto manualmente"""
     print("Reseteando puerto serie...")
@@ -166,7 +690,14 @@ if __name__ == "__main__":
     print("  PMTK605*31    - Ver firmware")
     print("  PMTK414*33    - Ver config NMEA")
     print("  PMTK101*32    - Hot restart")
+    print("  PMTK220,100; PMTK300,100,0,0,0,0 - Lote (checksum automatico)")
+    print("  config        - Configuracion de arranque en lote")
+    print(f"  upshift       - Subir a {UPSHIFT_BAUD} bps y {UPSHIFT_RATE_HZ}Hz")
+    print("  link          - Baudrate, tiempo hasta el primer fix y caudal")
     print("  monitor       - Ver datos NMEA")
+    print("  fix           - Ultimo fix parseado y errores de checksum")
+    print("  log <archivo> - Guardar NMEA en segundo plano (log off para parar)")
+    print("  track <archivo> - Grabar fixes en un track binario (track off para parar)")
     print("  reconnect     - Reconectar")
     print("  reset         - Resetear puerto")
     print("  quit          - Salir")
@@ -182,6 +713,24 @@ if __name__ == "__main__":
                 break
             elif cmd.lower() == 'monitor':
                 gps.monitor(10)
+            elif cmd.lower() == 'fix':
+                gps.status()
+            elif cmd.lower() == 'log off':
+                gps.stop_log()
+            elif cmd.lower().startswith('log '):
+                gps.start_log(cmd[4:].strip())
+            elif cmd.lower() == 'upshift':
+                gps.upshift()
+            elif cmd.lower() == 'link':
+                gps.link_status()
+            elif cmd.lower() == 'config':
+                gps.configure()
+            elif ';' in cmd:
+                print_results(gps.send_commands([part for part in cmd.split(';') if part.strip()]))
+            elif cmd.lower() == 'track off':
+                gps.stop_track()
+            elif cmd.lower().startswith('track '):
+                gps.start_track(cmd[6:].strip())
             elif cmd.lower() == 'reconnect':
                 gps.reconnect()
             elif cmd.lower() == 'reset':
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+NMEA v1.0 - Vectorized NMEA 0183 parser for the GPS tools
+Validates sentence checksums over whole byte chunks with numpy and turns
+GGA/RMC/GSA into compact fix records, live from the serial reader or
+offline from multi-hour log files.
+
+Usage: python3 nmea.py <log.nmea> [options]
+"""
+
+import argparse
+import calendar
+import sys
+import time
+from functools import reduce
+from operator import xor
+
+import numpy as np
+
+PARSE_CHUNK = 1 << 22  # Bytes por bloque al leer logs (4MB)
+MAX_PENDING = 1024  # Bytes sin fin de linea que se conservan entre bloques
+
+# Registro de fix: tiempo UTC (unix, NaN hasta conocer la fecha por RMC),
+# posicion (grados, NaN sin fix), altitud (m), HDOP, velocidad (m/s) y rumbo
+# de RMC, calidad y satelites de GGA, modo 1/2/3 de GSA (0 = desconocido)
+FIX_DTYPE = np.dtype([
+    ('time', '<f8'), ('lat', '<f8'), ('lon', '<f8'), ('alt', '<f4'), ('hdop', '<f4'),
+    ('speed', '<f4'), ('course', '<f4'), ('quality', 'u1'), ('sats', 'u1'), ('mode', 'u1'),
+])
+
+KNOTS_TO_MS = 0.514444
+
+# Valor de cada digito hexadecimal ASCII (-1 si no lo es)
+_HEX_VALUES = np.full(256, -1, dtype=np.int16)
+for _value, _char in enumerate(b'0123456789ABCDEF'):
+    _HEX_VALUES[_char] = _value
+    _HEX_VALUES[bytes([_char]).lower()[0]] = _value
+
+# Tipo de sentencia (3 letras tras el talker) como entero, para compararlo vectorizado
+_GGA, _RMC, _GSA = (int.from_bytes(name, 'big') for name in (b'GGA', b'RMC', b'GSA'))
+
+
+def checksum(body):
+    """Checksum NMEA (XOR de los bytes entre '$' y '*') como dos digitos hex"""
+    if isinstance(body, str):
+        body = body.encode('ascii')
+    return f"{reduce(xor, body, 0):02X}"
+
+
+def sentence(body):
+    """Sentencia completa '$<body>*hh' para enviar al receptor"""
+    body = body.strip().lstrip('$').split('*')[0]
+    return f"${body}*{checksum(body)}"
+
+
+def scan_sentences(data):
+    """
+    Localiza y valida las sentencias completas de un bloque de bytes
+
+    Todo se hace con operaciones vectorizadas sobre el bloque: posiciones
+    de '\\n', '$' y '*' con flatnonzero, emparejado con searchsorted y el
+    XOR de cada cuerpo con un solo np.bitwise_xor.reduceat.
+
+    Args:
+        data (bytes): Bloque de bytes NMEA (puede terminar a mitad de linea)
+
+    Returns:
+        tuple: (inicio '$', posicion '*' y checksum correcto de cada linea
+                con forma de sentencia, bytes consumidos hasta el ultimo '\\n')
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(buf == 0x0A)
+    empty = np.empty(0, dtype=np.intp)
+
+    if len(ends) == 0:
+        return empty, empty, np.empty(0, dtype=bool), 0
+
+    consumed = int(ends[-1]) + 1
+    dollars = np.flatnonzero(buf[:consumed] == 0x24)
+    stars = np.flatnonzero(buf[:consumed] == 0x2A)
+    if len(dollars) == 0 or len(stars) == 0:
+        return empty, empty, np.empty(0, dtype=bool), consumed
+
+    # Ultimo '$' de cada linea (descarta basura previa) y primer '*' tras el
+    line_starts = np.concatenate(([0], ends[:-1] + 1))
+    last_dollar = np.searchsorted(dollars, ends) - 1
+    starts = dollars[np.maximum(last_dollar, 0)]
+    first_star = np.searchsorted(stars, starts)
+    star = stars[np.minimum(first_star, len(stars) - 1)]
+
+    # Cuerpo de al menos 5 caracteres (talker + tipo) y dos digitos tras '*'
+    framed = (last_dollar >= 0) & (starts >= line_starts) & (first_star < len(stars)) & \
+        (star - starts > 5) & (star + 2 < ends)
+    starts = starts[framed]
+    star = star[framed]
+
+    if len(starts) == 0:
+        return empty, empty, np.empty(0, dtype=bool), consumed
+
+    bounds = np.empty(2 * len(starts), dtype=np.intp)
+    bounds[0::2] = starts + 1
+    bounds[1::2] = star
+    body_xor = np.bitwise_xor.reduceat(buf, bounds)[0::2]
+
+    high = _HEX_VALUES[buf[star + 1]]
+    low = _HEX_VALUES[buf[star + 2]]
+    valid = (high >= 0) & (low >= 0) & (body_xor == high * 16 + low)
+
+    return starts, star, valid, consumed
+
+
+def _coordinate(value, hemisphere):
+    """ddmm.mmmm + hemisferio a grados decimales (NaN si vacio)"""
+    if not value:
+        return np.nan
+    raw = float(value)
+    degrees = int(raw // 100)
+    result = degrees + (raw - degrees * 100) / 60
+    return -result if hemisphere in (b'S', b'W') else result
+
+
+def _seconds_of_day(value):
+    """hhmmss.sss a segundos desde medianoche (None si vacio)"""
+    if len(value) < 6:
+        return None
+    return int(value[0:2]) * 3600 + int(value[2:4]) * 60 + float(value[4:])
+
+
+def _number(value, default=np.nan):
+    return float(value) if value else default
+
+
+class NMEAParser:
+    """
+    Parser incremental de NMEA: bloques de bytes -> array de fixes
+
+    Los checksums y la separacion de sentencias se calculan vectorizados
+    por bloque (scan_sentences); solo las sentencias GGA, RMC y GSA validas
+    se dividen en campos. Cada GGA produce un registro FIX_DTYPE; RMC aporta
+    fecha, velocidad y rumbo y GSA el modo 2D/3D, tambien a la GGA de la
+    misma epoca que llego antes que ellas en el bloque.
+    """
+
+    def __init__(self):
+        self.sentences = 0  # Sentencias con checksum valido
+        self.checksum_errors = 0
+        self.field_errors = 0  # Checksum valido pero campos no numericos
+        self.fixes = 0
+        self.bytes = 0
+        self.date = None  # Medianoche UTC (unix) de la ultima RMC con fecha
+        self.speed = np.nan
+        self.course = np.nan
+        self.mode = 0
+        self._date_tod = 0.0  # Segundos del dia de esa RMC (cambio de dia)
+        self._pending = b''
+        self._dates = {}
+
+    def feed(self, data):
+        """
+        Procesa un bloque de bytes (bloques consecutivos del mismo flujo)
+
+        Returns:
+            ndarray: Fixes FIX_DTYPE de las GGA completas del bloque
+        """
+        self.bytes += len(data)
+        if self._pending:
+            data = self._pending + data
+
+        starts, stars, valid, consumed = scan_sentences(data)
+        self._pending = data[consumed:]
+        if len(self._pending) > MAX_PENDING:
+            self._pending = b''
+
+        self.sentences += int(valid.sum())
+        self.checksum_errors += int(len(valid) - valid.sum())
+
+        starts = starts[valid]
+        stars = stars[valid]
+        if len(starts) == 0:
+            return np.empty(0, dtype=FIX_DTYPE)
+
+        # Tipo de sentencia (3 letras tras el talker) sin recorrer texto en Python
+        buf = np.frombuffer(data, dtype=np.uint8)
+        kind = (buf[starts + 3].astype(np.int32) << 16) | (buf[starts + 4].astype(np.int32) << 8) | buf[starts + 5]
+        wanted = np.isin(kind, (_GGA, _RMC, _GSA))
+
+        rows = []
+        tods = []
+        for start, star, code in zip(starts[wanted].tolist(), stars[wanted].tolist(), kind[wanted].tolist()):
+            fields = data[start + 1:star].split(b',')
+            try:
+                if code == _GGA:
+                    self._gga(fields, rows, tods)
+                elif code == _RMC:
+                    self._rmc(fields, rows, tods)
+                else:
+                    self._gsa(fields, rows)
+            except (ValueError, IndexError):
+                self.field_errors += 1
+
+        self.fixes += len(rows)
+        return np.array([tuple(row) for row in rows], dtype=FIX_DTYPE)
+
+    def _gga(self, fields, rows, tods):
+        tod = _seconds_of_day(fields[1])
+        rows.append([
+            self._timestamp(tod), _coordinate(fields[2], fields[3]), _coordinate(fields[4], fields[5]),
+            _number(fields[9]), _number(fields[8]), self.speed, self.course,
+            int(fields[6] or 0), int(fields[7] or 0), self.mode,
+        ])
+        tods.append(tod)
+
+    def _rmc(self, fields, rows, tods):
+        tod = _seconds_of_day(fields[1])
+        if len(fields[9]) == 6 and tod is not None:
+            self.date = self._midnight(fields[9])
+            self._date_tod = tod
+        self.speed = _number(fields[7]) * KNOTS_TO_MS
+        self.course = _number(fields[8])
+
+        # GGA de la misma epoca ya emitida en este bloque
+        for index in range(len(rows) - 1, -1, -1):
+            if tods[index] != tod:
+                break
+            row = rows[index]
+            row[0] = self._timestamp(tod)
+            row[5] = self.speed
+            row[6] = self.course
+
+    def _gsa(self, fields, rows):
+        self.mode = int(fields[2] or 0)
+        if rows:
+            rows[-1][9] = self.mode
+
+    def _timestamp(self, tod):
+        """Segundos del dia + fecha de la ultima RMC (con cambio de dia)"""
+        if tod is None or self.date is None:
+            return np.nan
+        if tod < self._date_tod - 43200:
+            return self.date + 86400 + tod
+        if tod > self._date_tod + 43200:
+            return self.date - 86400 + tod
+        return self.date + tod
+
+    def _midnight(self, ddmmyy):
+        midnight = self._dates.get(ddmmyy)
+        if midnight is None:
+            day, month, year = int(ddmmyy[0:2]), int(ddmmyy[2:4]), 2000 + int(ddmmyy[4:6])
+            midnight = float(calendar.timegm((year, month, day, 0, 0, 0)))
+            self._dates[ddmmyy] = midnight
+        return midnight
+
+
+def parse_file(filename, chunk_size=PARSE_CHUNK, parser=None):
+    """
+    Parsea un log NMEA por bloques (memoria acotada por chunk_size)
+
+    Returns:
+        tuple: (fixes FIX_DTYPE de todo el log, parser con las estadisticas)
+    """
+    parser = parser or NMEAParser()
+    parts = []
+
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            fixes = parser.feed(block)
+            if len(fixes):
+                parts.append(fixes)
+
+    fixes = np.concatenate(parts) if parts else np.empty(0, dtype=FIX_DTYPE)
+    return fixes, parser
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parser NMEA de logs del GPS')
+    parser.add_argument('log', help='Archivo NMEA a procesar')
+    parser.add_argument('--chunk', type=int, default=PARSE_CHUNK,
+                       help=f'Bytes por bloque (default: {PARSE_CHUNK})')
+    parser.add_argument('--show', type=int, default=5,
+                       help='Fixes mostrados del principio y del final (default: 5)')
+
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    fixes, stats = parse_file(args.log, args.chunk)
+    elapsed = time.perf_counter() - start
+    mb = stats.bytes / (1024 * 1024)
+
+    print(f"=== NMEA {args.log} ===")
+    print(f"{mb:.1f}MB en {elapsed:.2f}s ({mb / elapsed if elapsed else 0:.1f} MB/s)")
+    print(f"Sentencias validas: {stats.sentences:,}, errores de checksum: {stats.checksum_errors:,}")
+    print(f"Fixes: {len(fixes):,} ({int((fixes['quality'] > 0).sum()):,} con posicion)")
+
+    shown = fixes if len(fixes) <= 2 * args.show else np.concatenate((fixes[:args.show], fixes[-args.show:]))
+    for fix in shown:
+        when = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(fix['time'])) if np.isfinite(fix['time']) else '?'
+        print(f"   {when} {fix['lat']:+.6f} {fix['lon']:+.6f} {fix['alt']:.1f}m "
+              f"q{fix['quality']} sats {fix['sats']} hdop {fix['hdop']:.1f}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+TRACK LOG v1.0 - Binary GPS track log with a memory-mapped time index
+Appends parsed fixes as fixed-width FIX_DTYPE records to a preallocated
+file, and answers position-at-time and time-range queries by binary
+search over the mapped timestamp column, even while it is being written.
+
+Usage: python3 track_log.py <track.gtrk> [options]
+"""
+
+import argparse
+import bisect
+import calendar
+import mmap
+import os
+import sys
+import time
+
+import numpy as np
+
+from nmea import FIX_DTYPE, parse_file
+
+TRACK_MAGIC = b'GTRK'
+TRACK_VERSION = 1
+TRACK_HEADER = 32  # Magic, version y tamanio de registro (<u4), registros escritos (<u8)
+COUNT_OFFSET = 16  # Posicion del contador de registros en la cabecera
+TRACK_GROWTH = 1 << 16  # Registros reservados por ampliacion (~2.8MB, ~1.8h a 10Hz)
+TRACK_FSYNC = 5.0  # Segundos maximos entre fsync del log
+MAX_GAP = 5.0  # Hueco maximo entre fixes para interpolar una posicion (s)
+
+
+def _header(count):
+    return (TRACK_MAGIC + np.array([TRACK_VERSION, FIX_DTYPE.itemsize], dtype='<u4').tobytes()
+            + bytes(COUNT_OFFSET - len(TRACK_MAGIC) - 8) + np.array([count], dtype='<u8').tobytes()
+            + bytes(TRACK_HEADER - COUNT_OFFSET - 8))
+
+
+def _check_header(data, filename):
+    """Registros escritos segun la cabecera (ValueError si no es un track valido)"""
+    if len(data) < TRACK_HEADER or not bytes(data[:len(TRACK_MAGIC)]) == TRACK_MAGIC:
+        raise ValueError(f"{filename} no es un track GTRK")
+    version, record_size = np.frombuffer(data, dtype='<u4', count=2, offset=len(TRACK_MAGIC))
+    if version != TRACK_VERSION or record_size != FIX_DTYPE.itemsize:
+        raise ValueError(f"{filename}: version {version} / registro {record_size}B no soportados")
+    return int(np.frombuffer(data, dtype='<u8', count=1, offset=COUNT_OFFSET)[0])
+
+
+class TrackWriter:
+    """
+    Escritor del track: registros FIX_DTYPE de ancho fijo tras una cabecera
+
+    El archivo crece de TRACK_GROWTH en TRACK_GROWTH registros reservados
+    con fallocate, asi que cada fix es un pwrite sin ampliar el archivo. El
+    contador de la cabecera se actualiza despues de los datos: un lector
+    nunca ve registros a medio escribir. Solo se guardan fixes con hora y
+    en orden creciente, que es lo que permite la busqueda binaria.
+    """
+
+    def __init__(self, filename, fsync_interval=TRACK_FSYNC, growth=TRACK_GROWTH):
+        self.filename = filename
+        self.fsync_interval = fsync_interval
+        self.growth = growth
+        self.skipped = 0  # Fixes sin hora o fuera de orden
+        self.fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+
+        size = os.fstat(self.fd).st_size
+        if size:
+            # Continuar un track existente
+            self.count = _check_header(os.pread(self.fd, TRACK_HEADER, 0), filename)
+            last = os.pread(self.fd, FIX_DTYPE.itemsize, TRACK_HEADER + (self.count - 1) * FIX_DTYPE.itemsize) \
+                if self.count else b''
+            self.last_time = float(np.frombuffer(last, dtype=FIX_DTYPE)['time'][0]) if last else -np.inf
+        else:
+            self.count = 0
+            self.last_time = -np.inf
+            os.pwrite(self.fd, _header(0), 0)
+            size = TRACK_HEADER
+
+        self.capacity = (size - TRACK_HEADER) // FIX_DTYPE.itemsize
+        self.last_sync = time.monotonic()
+
+    def append(self, fixes):
+        """
+        Agrega uno o varios fixes (FIX_DTYPE) al final del track
+
+        Returns:
+            int: Registros escritos
+        """
+        fixes = np.asarray(fixes, dtype=FIX_DTYPE).reshape(-1)
+        times = fixes['time']
+
+        # Hora conocida y estrictamente creciente (tambien respecto al track); fmax ignora NaN
+        keep = np.isfinite(times) & (times > np.fmax.accumulate(np.concatenate(([self.last_time], times[:-1]))))
+        if not keep.all():
+            self.skipped += int(len(keep) - keep.sum())
+            fixes = fixes[keep]
+        if len(fixes) == 0:
+            return 0
+
+        if self.count + len(fixes) > self.capacity:
+            self._grow(self.count + len(fixes))
+
+        os.pwrite(self.fd, fixes.tobytes(), TRACK_HEADER + self.count * FIX_DTYPE.itemsize)
+        self.count += len(fixes)
+        self.last_time = float(fixes['time'][-1])
+        os.pwrite(self.fd, np.array([self.count], dtype='<u8').tobytes(), COUNT_OFFSET)
+
+        if time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+        return len(fixes)
+
+    def sync(self):
+        os.fsync(self.fd)
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        """fsync final y recorte de la reserva sin usar"""
+        if self.fd is None:
+            return
+        os.ftruncate(self.fd, TRACK_HEADER + self.count * FIX_DTYPE.itemsize)
+        self.sync()
+        os.close(self.fd)
+        self.fd = None
+
+    def _grow(self, needed):
+        capacity = max(needed, self.capacity + self.growth)
+        size = TRACK_HEADER + capacity * FIX_DTYPE.itemsize
+        try:
+            os.posix_fallocate(self.fd, 0, size)
+        except (AttributeError, OSError):
+            os.ftruncate(self.fd, size)  # Sin fallocate (macOS, algunos FS)
+        self.capacity = capacity
+
+
+class TrackReader:
+    """
+    Lector del track por mmap: consultas por tiempo en O(log n)
+
+    La columna 'time' es una vista con paso de registro sobre el mapa, y
+    bisect la recorre sin copiarla (np.searchsorted copiaria la columna
+    entera en cada consulta). refresh() relee el contador de la cabecera y
+    amplia el mapa si el escritor ha crecido el archivo, asi que el track
+    puede consultarse mientras se graba.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'rb')
+        self.mm = None
+        self.fixes = np.empty(0, dtype=FIX_DTYPE)
+        self.refresh()
+
+    def refresh(self):
+        """Incorpora los registros escritos desde la ultima llamada"""
+        size = os.fstat(self.file.fileno()).st_size
+        if self.mm is None or size > len(self.mm):
+            mm = mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_READ)
+            self.fixes = np.empty(0, dtype=FIX_DTYPE)  # Suelta las vistas del mapa anterior
+            self._release()
+            self.mm = mm
+
+        count = _check_header(self.mm, self.filename)
+        count = min(count, (len(self.mm) - TRACK_HEADER) // FIX_DTYPE.itemsize)
+        if count != len(self.fixes):
+            self.fixes = np.ndarray(count, dtype=FIX_DTYPE, buffer=self.mm, offset=TRACK_HEADER)
+        return count
+
+    def index(self, t):
+        """Primer registro con tiempo >= t (busqueda binaria sobre el mapa)"""
+        return bisect.bisect_left(self.fixes['time'], t)
+
+    def nearest(self, t):
+        """Fix mas cercano en el tiempo a t (None si el track esta vacio)"""
+        if len(self.fixes) == 0:
+            return None
+        index = self.index(t)
+        if index == len(self.fixes) or (index and t - self.fixes['time'][index - 1] < self.fixes['time'][index] - t):
+            index -= 1
+        return self.fixes[index]
+
+    def position_at(self, t, max_gap=MAX_GAP):
+        """
+        Posicion interpolada en el instante t
+
+        Returns:
+            tuple: (lat, lon, alt) entre los dos fixes que rodean t, o None
+                   fuera del track, sin posicion o con un hueco > max_gap
+        """
+        times = self.fixes['time']
+        index = self.index(t)
+        if index < len(times) and times[index] == t:
+            before = after = self.fixes[index]
+        elif 0 < index < len(times):
+            before, after = self.fixes[index - 1], self.fixes[index]
+        else:
+            return None
+
+        if before['quality'] == 0 or after['quality'] == 0 or after['time'] - before['time'] > max_gap:
+            return None
+
+        weight = (t - before['time']) / (after['time'] - before['time']) if after['time'] > before['time'] else 0.0
+        return tuple(float(before[name] + weight * (after[name] - before[name])) for name in ('lat', 'lon', 'alt'))
+
+    def between(self, start, end):
+        """Fixes con start <= tiempo < end (vista sobre el mapa, sin copia)"""
+        return self.fixes[self.index(start):self.index(end)]
+
+    def close(self):
+        self.fixes = np.empty(0, dtype=FIX_DTYPE)
+        self._release()
+        self.mm = None
+        self.file.close()
+
+    def _release(self):
+        """Cierra el mapa actual (si quedan vistas fuera, lo cerrara el recolector)"""
+        if self.mm is not None:
+            try:
+                self.mm.close()
+            except BufferError:
+                pass
+
+    def __len__(self):
+        return len(self.fixes)
+
+
+def parse_time(value):
+    """Segundos unix o 'AAAA-MM-DDTHH:MM:SS[.s]' UTC"""
+    try:
+        return float(value)
+    except ValueError:
+        whole, _, fraction = value.partition('.')
+        seconds = calendar.timegm(time.strptime(whole, '%Y-%m-%dT%H:%M:%S'))
+        return seconds + (float(f'0.{fraction}') if fraction else 0.0)
+
+
+def format_time(t):
+    if not np.isfinite(t):
+        return '?'
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(t)) + f".{int(t * 10) % 10}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Track GPS binario: importacion y consultas por tiempo')
+    parser.add_argument('track', help='Archivo de track (.gtrk)')
+    parser.add_argument('--import-nmea', metavar='LOG',
+                       help='Agregar al track los fixes de un log NMEA')
+    parser.add_argument('--at', metavar='T',
+                       help='Posicion en el instante T (unix o AAAA-MM-DDTHH:MM:SS UTC)')
+    parser.add_argument('--range', nargs=2, metavar=('T0', 'T1'),
+                       help='Fixes entre T0 y T1')
+    parser.add_argument('--show', type=int, default=5,
+                       help='Fixes mostrados de un rango (default: 5)')
+
+    args = parser.parse_args()
+
+    if args.import_nmea:
+        fixes, stats = parse_file(args.import_nmea)
+        writer = TrackWriter(args.track)
+        written = writer.append(fixes)
+        writer.close()
+        print(f"Importados {written:,} fixes de {args.import_nmea} "
+              f"({writer.skipped:,} sin hora o fuera de orden)")
+
+    reader = TrackReader(args.track)
+    fixes = reader.fixes
+
+    print(f"=== TRACK {args.track} ===")
+    if len(fixes) == 0:
+        print("Track vacio")
+        return 0
+
+    print(f"{len(fixes):,} fixes ({len(fixes) * FIX_DTYPE.itemsize / (1024 * 1024):.1f}MB), "
+          f"{format_time(fixes['time'][0])} -> {format_time(fixes['time'][-1])} UTC")
+
+    if args.at:
+        t = parse_time(args.at)
+        start = time.perf_counter()
+        position = reader.position_at(t)
+        elapsed = time.perf_counter() - start
+        if position:
+            print(f"{format_time(t)}: {position[0]:+.6f} {position[1]:+.6f} {position[2]:.1f}m "
+                  f"({elapsed * 1e6:.0f}μs)")
+        else:
+            fix = reader.nearest(t)
+            print(f"{format_time(t)}: sin posicion (fix mas cercano {format_time(fix['time'])})")
+
+    if args.range:
+        selected = reader.between(parse_time(args.range[0]), parse_time(args.range[1]))
+        print(f"Rango: {len(selected):,} fixes")
+        shown = selected if len(selected) <= 2 * args.show else \
+            np.concatenate((selected[:args.show], selected[-args.show:]))
+        for fix in shown:
+            print(f"   {format_time(fix['time'])} {fix['lat']:+.6f} {fix['lon']:+.6f} {fix['alt']:.1f}m "
+                  f"q{fix['quality']} sats {fix['sats']}")
+
+    reader.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,16 +7,19 @@ WARNING: For authorized personnel only. Monitor spectral output via oscilloscope
 Target: Raspberry Pi Zero 2W | Neural Node: GPIO 18 | Frequency: 15.000 kHz
 """
 
-import RPi.GPIO as GPIO
+import argparse
 import time
 import signal
 import sys
 
+from gpio_backend import BACKENDS, SimulatedGPIO, load_backend
+
 # Configuracion
 GPIO_PIN = 18  # Pin GPIO donde conectas el osciloscopio
 FREQUENCY = 15000  # 15KHz
 DUTY_CYCLE = 50  # 50% duty cycle para onda cuadrada perfecta
 gpio_initialized = False  # Flag para controlar si GPIO fue inicializado
+GPIO = None  # Backend GPIO (RPi.GPIO o simulado), cargado en setup_gpio
 
 def cleanup_gpio():
     """Limpia GPIO solo si fue inicializado"""
@@ -31,18 +34,22 @@ def signal_handler(sig, frame):
     cleanup_gpio()
     sys.exit(0)
 
-def setup_gpio():
-    """Configura el pin GPIO"""
-    global gpio_initialized
+def setup_gpio(backend='rpi'):
+    """Configura el pin GPIO con el backend indicado ('rpi' o 'sim')"""
+    global GPIO, gpio_initialized
+    GPIO = load_backend(backend)
     GPIO.setmode(GPIO.BCM)  # Usar numeracion BCM
     GPIO.setup(GPIO_PIN, GPIO.OUT)
     gpio_initialized = True
     print(f"GPIO {GPIO_PIN} configurado como salida")
 
-def generate_square_wave_pwm():
+def generate_square_wave_pwm(duration=0):
     """
     Genera onda cuadrada usando PWM de RPi.GPIO
     Metodo mas preciso para frecuencias altas
+
+    Args:
+        duration (float): Segundos de emision (0 = hasta Ctrl+C)
     """
     print(f"Iniciando generacion de onda cuadrada de {FREQUENCY}Hz en GPIO {GPIO_PIN}")
     print("Presiona Ctrl+C para detener")
@@ -55,18 +62,22 @@ def generate_square_wave_pwm():
         pwm.start(DUTY_CYCLE)
         
         # Mantener la senial funcionando
-        while True:
-            time.sleep(1)
+        deadline = time.monotonic() + duration if duration else float('inf')
+        while time.monotonic() < deadline:
+            time.sleep(min(1, max(0, deadline - time.monotonic())))
             
     except KeyboardInterrupt:
         pass
     finally:
         pwm.stop()
 
-def generate_square_wave_manual():
+def generate_square_wave_manual(duration=0):
     """
     Genera onda cuadrada manualmente (metodo alternativo)
     Menos preciso para frecuencias altas, pero util para entender el concepto
+
+    Args:
+        duration (float): Segundos de emision (0 = hasta Ctrl+C)
     """
     # Calcular periodo y tiempos
     period = 1.0 / FREQUENCY  # Periodo en segundos
@@ -75,8 +86,10 @@ def generate_square_wave_manual():
     print(f"Metodo manual - Periodo: {period*1000:.3f}ms, Medio periodo: {half_period*1000000:.1f}μs")
     print("ADVERTENCIA: Este metodo puede no ser preciso para 15KHz")
     
+    deadline = time.monotonic() + duration if duration else float('inf')
+
     try:
-        while True:
+        while time.monotonic() < deadline:
             GPIO.output(GPIO_PIN, GPIO.HIGH)
             time.sleep(half_period)
             GPIO.output(GPIO_PIN, GPIO.LOW)
@@ -84,8 +97,41 @@ def generate_square_wave_manual():
     except KeyboardInterrupt:
         pass
 
+    print_timing(half_period)
+
+def print_timing(half_period):
+    """Jitter y deriva de la onda manual frente a la ideal (solo GPIO simulado)"""
+    if not isinstance(GPIO, SimulatedGPIO):
+        return
+
+    import numpy as np  # Solo con GPIO simulado: el generador no necesita numpy en la Pi
+
+    _, levels = GPIO.events(GPIO_PIN)
+    cycles = int(np.count_nonzero(levels == GPIO.HIGH))
+    half_us = half_period * 1e6
+    stats = GPIO.timing_stats(np.full(cycles, half_us), np.full(max(cycles - 1, 0), half_us), GPIO_PIN)
+    if stats is None:
+        return
+
+    period_us = 2 * (half_us + stats['error_mean_us'])
+    print(f"\n=== FIDELIDAD TEMPORAL (GPIO simulado) ===")
+    print(f"Ciclos: {cycles}, frecuencia real: {1e6 / period_us:.0f}Hz (objetivo {FREQUENCY}Hz)")
+    print(f"Error por semiperiodo: medio {stats['error_mean_us']:+.1f}μs, jitter {stats['jitter_us']:.1f}μs")
+    print(f"|Error| p50/p99/max: {stats['error_p50_us']:.1f} / {stats['error_p99_us']:.1f} / "
+          f"{stats['error_max_us']:.1f}μs")
+    print(f"Deriva acumulada: {stats['drift_us']:+.1f}μs ({stats['drift_ppm']:+.0f} ppm)")
+
 def main():
     """Funcion principal"""
+    parser = argparse.ArgumentParser(description='Generador de onda cuadrada por GPIO')
+    parser.add_argument('--gpio-backend', choices=BACKENDS, default='rpi',
+                        help='Backend GPIO: rpi o sim (pin simulado, mide jitter/deriva) (default: rpi)')
+    parser.add_argument('--method', choices=['1', '2'],
+                        help='Metodo de generacion sin preguntar (1 = PWM, 2 = manual)')
+    parser.add_argument('--duration', type=float, default=0,
+                        help='Segundos de emision (default: 0, hasta Ctrl+C)')
+    args = parser.parse_args()
+
     print("=== Generador de Onda Cuadrada 15KHz ===")
     print(f"Pin GPIO: {GPIO_PIN}")
     print(f"Frecuencia: {FREQUENCY} Hz")
@@ -96,7 +142,7 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     
     # Configurar GPIO
-    setup_gpio()
+    setup_gpio(args.gpio_backend)
     
     # Elegir metodo de generacion
     print("Metodos disponibles:")
@@ -104,15 +150,15 @@ def main():
     print("2. Manual (Solo para demostracion)")
     
     try:
-        choice = input("\nSelecciona metodo (1 o 2): ").strip()
+        choice = args.method or input("\nSelecciona metodo (1 o 2): ").strip()
         
         if choice == "1":
-            generate_square_wave_pwm()
+            generate_square_wave_pwm(args.duration)
         elif choice == "2":
-            generate_square_wave_manual()
+            generate_square_wave_manual(args.duration)
         else:
             print("Opcion invalida, usando PWM por defecto")
-            generate_square_wave_pwm()
+            generate_square_wave_pwm(args.duration)
             
     except KeyboardInterrupt:
         pass
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+GPIO BACKEND v1.0 - Pluggable GPIO output for the RF tools
+'rpi' drives the real pins through RPi.GPIO; 'sim' is an in-process pin
+that timestamps every level change, so output timing fidelity can be
+benchmarked on any Linux host.
+"""
+
+import time
+
+BACKENDS = ('rpi', 'sim')
+SIM_CAPACITY = 1 << 18  # Eventos preasignados del pin simulado
+
+
+def load_backend(name='rpi'):
+    """
+    Devuelve un backend con la interfaz de RPi.GPIO que usan las herramientas
+
+    (setmode, setup, output, PWM, cleanup y las constantes BCM/OUT/HIGH/LOW)
+
+    Args:
+        name (str): 'rpi' (pines reales) o 'sim' (pin simulado)
+    """
+    if name == 'rpi':
+        import RPi.GPIO as GPIO  # Solo disponible en la Raspberry Pi
+        return GPIO
+
+    if name == 'sim':
+        return SimulatedGPIO()
+
+    raise ValueError(f"Backend GPIO desconocido: {name} (disponibles: {', '.join(BACKENDS)})")
+
+
+def timing_stats(timestamps_ns, levels, pulse_us, gap_us):
+    """
+    Compara los flancos registrados con la secuencia prevista pulso/gap
+
+    Cada repeticion de la secuencia son 2 * len(pulse_us) flancos (subida,
+    bajada, subida...); las escrituras que no cambian el nivel se ignoran.
+
+    Args:
+        timestamps_ns (ndarray): Instante de cada escritura (perf_counter_ns)
+        levels (ndarray): Nivel escrito en cada evento
+        pulse_us (ndarray): Duraciones previstas de los pulsos (μs)
+        gap_us (ndarray): Duraciones previstas de los gaps entre pulsos (μs)
+
+    Returns:
+        dict: Error por flanco (jitter), deriva acumulada al final de cada
+              repeticion, o None si no hay ninguna repeticion completa
+    """
+    import numpy as np  # Solo para el pin simulado: 'rpi' no necesita numpy en la Pi
+
+    n_pulses = len(pulse_us)
+    if n_pulses == 0:
+        return None
+
+    # Solo cambios de nivel reales (el pin arranca en LOW)
+    changes = np.flatnonzero(np.diff(levels.astype(np.int8), prepend=np.int8(0)))
+    edges_per_rep = 2 * n_pulses
+    repetitions = len(changes) // edges_per_rep
+    if repetitions == 0:
+        return None
+
+    edges = timestamps_ns[changes[:repetitions * edges_per_rep]].reshape(repetitions, edges_per_rep)
+
+    # Secuencia prevista: p0, g0, p1, g1, ..., p(n-1)
+    schedule = np.empty(edges_per_rep - 1, dtype=np.float64)
+    schedule[0::2] = pulse_us
+    schedule[1::2] = gap_us[:n_pulses - 1]
+
+    measured = np.diff(edges, axis=1) / 1000
+    error = measured - schedule
+    abs_error = np.abs(error)
+
+    # Deriva: posicion de cada flanco respecto al calendario ideal
+    planned = np.concatenate(([0.0], np.cumsum(schedule)))
+    drift = (edges - edges[:, :1]) / 1000 - planned
+    final_drift = drift[:, -1]
+
+    return {
+        'repetitions': repetitions,
+        'edges': repetitions * edges_per_rep,
+        'error_mean_us': round(float(error.mean()), 2),
+        'jitter_us': round(float(error.std()), 2),
+        'error_p50_us': round(float(np.percentile(abs_error, 50)), 2),
+        'error_p99_us': round(float(np.percentile(abs_error, 99)), 2),
+        'error_max_us': round(float(abs_error.max()), 2),
+        'drift_us': round(float(final_drift.mean()), 2),
+        'drift_ppm': round(float(final_drift.mean() / planned[-1] * 1e6), 1) if planned[-1] else None,
+    }
+
+
+class SimulatedGPIO:
+    """
+    Pin GPIO simulado: registra cada escritura con perf_counter_ns
+
+    Los eventos se guardan en arrays preasignados para no asignar memoria
+    dentro del bucle de transmision; si se llenan se duplica su capacidad.
+    """
+    BOARD = 10
+    BCM = 11
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self, capacity=SIM_CAPACITY):
+        import numpy as np
+
+        self.mode = None
+        self.pins = set()
+        self.timestamps = np.empty(capacity, dtype=np.int64)
+        self.levels = np.empty(capacity, dtype=np.int8)
+        self.event_pins = np.empty(capacity, dtype=np.int16)
+        self.count = 0
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setup(self, pin, direction, initial=None):
+        if self.mode is None:
+            raise RuntimeError("Modo de numeracion no configurado (setmode)")
+        self.pins.add(pin)
+        if direction == self.OUT and initial is not None:
+            self.output(pin, initial)
+
+    def output(self, pin, level):
+        now = time.perf_counter_ns()
+        if pin not in self.pins:
+            raise RuntimeError(f"GPIO {pin} no configurado como salida")
+
+        index = self.count
+        if index == len(self.timestamps):
+            self._grow()
+
+        self.timestamps[index] = now
+        self.levels[index] = level
+        self.event_pins[index] = pin
+        self.count = index + 1
+
+    def PWM(self, pin, frequency):
+        return SimulatedPWM(self, pin, frequency)
+
+    def cleanup(self):
+        """Libera los pines; los eventos registrados se conservan"""
+        self.pins.clear()
+        self.mode = None
+
+    def events(self, pin=None):
+        """Eventos registrados (timestamps ns, niveles), opcionalmente de un pin"""
+        timestamps = self.timestamps[:self.count]
+        levels = self.levels[:self.count]
+
+        if pin is not None:
+            mask = self.event_pins[:self.count] == pin
+            timestamps, levels = timestamps[mask], levels[mask]
+
+        return timestamps, levels
+
+    def reset(self):
+        """Descarta los eventos registrados (conserva la capacidad)"""
+        self.count = 0
+
+    def timing_stats(self, pulse_us, gap_us, pin=None):
+        """Fidelidad temporal de los eventos frente a la secuencia prevista"""
+        return timing_stats(*self.events(pin), pulse_us, gap_us)
+
+    def _grow(self):
+        import numpy as np
+
+        capacity = 2 * len(self.timestamps)
+        self.timestamps = np.resize(self.timestamps, capacity)
+        self.levels = np.resize(self.levels, capacity)
+        self.event_pins = np.resize(self.event_pins, capacity)
+
+
+class SimulatedPWM:
+    """PWM simulado: registra arranque (HIGH) y parada (LOW), onda ideal"""
+
+    def __init__(self, gpio, pin, frequency):
+        self.gpio = gpio
+        self.pin = pin
+        self.frequency = frequency
+        self.duty_cycle = 0
+        self.running = False
+
+    def start(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+        self.running = True
+        self.gpio.output(self.pin, self.gpio.HIGH)
+
+    def ChangeDutyCycle(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        if self.running:
+            self.running = False
+            self.gpio.output(self.pin, self.gpio.LOW)
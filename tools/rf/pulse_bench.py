@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+PULSE BENCH v1.0 - Benchmarks for the SHADOW PULSE analysis pipeline
+Measures the throughput and memory of each signal processing stage on
+synthetic captures with known ground truth, and replay timing fidelity
+on a simulated GPIO pin. Runs on any Linux host, no RPi.GPIO required.
+
+Usage: python3 pulse_bench.py [options]
+"""
+
+import argparse
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from pulse_synth import write_capture
+from shadow_pulse import CU8ReplayDevice, iq_magnitude, magnitude_lut
+
+
+def legacy_magnitude(raw_data):
+    """Ruta original: conversion a float32 y sqrt por muestra"""
+    iq_data = np.frombuffer(raw_data, dtype=np.uint8).astype(np.float32)
+    iq_data = iq_data - 127.5
+
+    i_samples = iq_data[0::2]
+    q_samples = iq_data[1::2]
+
+    return np.sqrt(i_samples**2 + q_samples**2)
+
+
+def best_time(func, *args, repeat=5):
+    """Mejor tiempo de ejecucion (segundos) sobre varias repeticiones"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_magnitude(n_samples, repeat):
+    """Compara la magnitud float32 original contra el LUT uint8/uint16"""
+    rng = np.random.default_rng(0)
+    raw_data = rng.integers(0, 256, n_samples * 2, dtype=np.uint8)
+    reference = legacy_magnitude(raw_data)
+
+    # Construir tablas fuera de la medicion
+    magnitude_lut(np.uint8)
+    magnitude_lut(np.uint16)
+
+    print(f"\n=== MAGNITUD IQ ({n_samples:,} muestras) ===")
+
+    legacy_time = best_time(legacy_magnitude, raw_data, repeat=repeat)
+    print(f"   float32 sqrt : {legacy_time * 1000:8.1f}ms  {n_samples / legacy_time / 1e6:7.1f} MS/s")
+
+    for dtype, scale in ((np.uint8, 1), (np.uint16, 256)):
+        lut_time = best_time(iq_magnitude, raw_data, dtype, repeat=repeat)
+        error = np.abs(iq_magnitude(raw_data, dtype) / scale - reference).max()
+        print(f"   LUT {np.dtype(dtype).name:<8} : {lut_time * 1000:8.1f}ms  "
+              f"{n_samples / lut_time / 1e6:7.1f} MS/s  "
+              f"x{legacy_time / lut_time:.1f}  error max {error:.3f}")
+
+
+def pipeline_stages(device, filename, raw_data, min_pulse):
+    """Etapas del pipeline en orden, cada una como (nombre, callable)"""
+    state = {}
+
+    def process():
+        state['amplitude'] = device._process_iq_data(raw_data)
+
+    def detect():
+        device._detect_pulses(state['amplitude'], 3.0, min_pulse)
+
+    def group():
+        device._group_durations(device.pulse_data)
+        device._group_durations(device.gap_data)
+
+    def structure():
+        device._analyze_signal_structure()
+
+    def full():
+        device.load_and_analyze_cu8(filename, 3.0, min_pulse)
+
+    return [
+        ('_process_iq_data', process),
+        ('_detect_pulses', detect),
+        ('_group_durations', group),
+        ('_analyze_signal_structure', structure),
+        ('load_and_analyze_cu8', full),
+    ]
+
+
+def check_recovery(device, truth, us_per_sample):
+    """Compara pulsos/gaps extraidos con la verdad del generador"""
+    tolerance = max(2 * us_per_sample, 1.0)
+
+    for name, found, expected in (('pulsos', device.pulse_data, truth['pulses']),
+                                  ('gaps', device.gap_data, truth['gaps'])):
+        if len(found) != len(expected):
+            return f"FALLO {name} {len(found)}/{len(expected)}"
+        error = np.abs(found - expected).max() if len(found) else 0.0
+        if error > tolerance:
+            return f"FALLO {name} error {error:.0f}μs"
+
+    return "OK"
+
+
+def bench_pipeline(sizes_mb, sample_rate, snr_db, repeat, workdir):
+    """Mide cada etapa del pipeline para varios tamanios de captura"""
+    us_per_sample = 1e6 / sample_rate
+    min_pulse = max(1, int(100 / us_per_sample))  # 100μs
+    message_bytes = 2 * sample_rate * (24 * (300 + 900) + 9000) / 1e6
+
+    print(f"\n=== PIPELINE ({sample_rate:,} Hz, SNR {snr_db:.0f}dB) ===")
+    print(f"   {'etapa':<26} {'MB':>6} {'ms':>9} {'MB/s':>8} {'pico MB':>8}")
+
+    for size_mb in sizes_mb:
+        filename = os.path.join(workdir, f"bench_{size_mb}mb.cu8")
+        n_messages = max(1, int(size_mb * 1024 * 1024 / message_bytes))
+        truth = write_capture(filename, n_messages=n_messages, sample_rate=sample_rate,
+                              snr_db=snr_db, seed=size_mb)
+
+        with open(filename, 'rb') as f:
+            raw_data = f.read()
+        file_mb = len(raw_data) / (1024 * 1024)
+
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            device = CU8ReplayDevice(sample_rate=sample_rate, init_gpio=False)
+            stages = pipeline_stages(device, filename, raw_data, min_pulse)
+
+            # Tiempo: mejor de N sin tracemalloc
+            timings = {}
+            for name, stage in stages:
+                timings[name] = best_time(stage, repeat=repeat)
+
+            # Memoria: pico de asignaciones de cada etapa
+            peaks = {}
+            tracemalloc.start()
+            for name, stage in stages:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                stage()
+                peaks[name] = (tracemalloc.get_traced_memory()[1] - base) / (1024 * 1024)
+            tracemalloc.stop()
+
+        for name, _ in stages:
+            seconds = timings[name]
+            print(f"   {name:<26} {file_mb:6.1f} {seconds * 1000:9.1f} "
+                  f"{file_mb / seconds:8.1f} {peaks[name]:8.1f}")
+
+        print(f"   Recuperacion ({n_messages} mensajes, {len(truth['pulses'])} pulsos): "
+              f"{check_recovery(device, truth, us_per_sample)}")
+
+        os.remove(filename)
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\nRSS maximo del proceso: {max_rss:.1f}MB")
+
+
+def bench_replay(sample_rate, repeat, workdir):
+    """Fidelidad temporal del replay sobre el pin GPIO simulado"""
+    filename = os.path.join(workdir, 'replay.cu8')
+    write_capture(filename, n_messages=5, sample_rate=sample_rate)
+    min_pulse = max(1, int(100e-6 * sample_rate))
+
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        device = CU8ReplayDevice(sample_rate=sample_rate, init_gpio=False, gpio_backend='sim')
+        ok = device.load_and_analyze_cu8(filename, 3.0, min_pulse) and \
+            device.replay_signal(repetitions=repeat, delay_between_reps=0)
+        stats = device.replay_timing() if ok else None
+
+    print(f"\n=== REPLAY GPIO SIMULADO ({len(device.pulse_data)} pulsos x {repeat}) ===")
+    if stats is None:
+        print("   Sin replay completo")
+        return
+
+    print(f"   Error por flanco: medio {stats['error_mean_us']:+.1f}μs, jitter {stats['jitter_us']:.1f}μs")
+    print(f"   |Error| p50/p99/max: {stats['error_p50_us']:.1f} / {stats['error_p99_us']:.1f} / "
+          f"{stats['error_max_us']:.1f}μs")
+    print(f"   Deriva por repeticion: {stats['drift_us']:+.1f}μs ({stats['drift_ppm']:+.0f} ppm)")
+
+
+def first_output_time(command):
+    """Segundos hasta la primera linea de stdout y hasta el final del proceso"""
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    process.stdout.readline()
+    first_line = time.perf_counter() - start
+    process.stdout.read()
+    process.wait()
+    return first_line, time.perf_counter() - start
+
+
+def bench_cold_start(sample_rate, repeat, workdir):
+    """Arranque en frio de shadow_pulse: hasta la primera salida y hasta terminar"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shadow_pulse.py')
+    filename = os.path.join(workdir, 'cold_start.cu8')
+    write_capture(filename, n_messages=5, sample_rate=sample_rate)
+    min_pulse = max(1, int(100e-6 * sample_rate))
+
+    commands = [
+        ('import numpy', [sys.executable, '-c', 'import numpy; print()']),
+        ('--help', [sys.executable, script, '--help']),
+        ('--analyze-only', [sys.executable, script, filename, '--analyze-only',
+                            '-s', str(sample_rate), '--min-pulse', str(min_pulse)]),
+    ]
+
+    print(f"\n=== ARRANQUE EN FRIO (mejor de {repeat}) ===")
+    print(f"   {'comando':<16} {'1a salida ms':>13} {'total ms':>9}")
+
+    for name, command in commands:
+        runs = [first_output_time(command) for _ in range(repeat)]
+        first_line = min(run[0] for run in runs)
+        total = min(run[1] for run in runs)
+        print(f"   {name:<16} {first_line * 1000:13.1f} {total * 1000:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks del pipeline de shadow_pulse')
+    parser.add_argument('-n', '--samples', type=int, default=4_000_000,
+                       help='Muestras IQ para el benchmark de magnitud (default: 4000000)')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                       help='Repeticiones por medicion (default: 3)')
+    parser.add_argument('--sizes', default='1,4,16',
+                       help='Tamanios de captura MB separados por coma (default: 1,4,16)')
+    parser.add_argument('-s', '--sample-rate', type=int, default=250000,
+                       help='Frecuencia de muestreo Hz (default: 250000)')
+    parser.add_argument('--snr', type=float, default=20.0,
+                       help='SNR de las capturas sinteticas dB (default: 20)')
+    parser.add_argument('--stage', choices=['all', 'magnitude', 'pipeline', 'cold-start', 'replay'],
+                       default='all',
+                       help='Benchmarks a ejecutar (default: all)')
+
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+
+    print(f"=== PULSE BENCH ===")
+    print(f"Plataforma: {platform.machine()} / Python {platform.python_version()} / NumPy {np.__version__}")
+
+    if args.stage in ('all', 'magnitude'):
+        bench_magnitude(args.samples, args.repeat)
+
+    with tempfile.TemporaryDirectory(prefix='pulse_bench_') as workdir:
+        if args.stage in ('all', 'pipeline'):
+            bench_pipeline(sizes, args.sample_rate, args.snr, args.repeat, workdir)
+
+        if args.stage in ('all', 'cold-start'):
+            bench_cold_start(args.sample_rate, args.repeat, workdir)
+
+        if args.stage in ('all', 'replay'):
+            bench_replay(args.sample_rate, args.repeat, workdir)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+PULSE SYNTH v1.0 - Synthetic OOK capture generator
+Forges cu8 captures of 433MHz-style OOK remotes with known ground truth,
+for benchmarking and validating the SHADOW PULSE pipeline.
+
+Usage: python3 pulse_synth.py <output.cu8 | -> [options]
+"""
+
+import argparse
+import sys
+from contextlib import nullcontext
+
+import numpy as np
+
+LEAD_IN_US = 5000  # Silencio inicial antes del primer mensaje
+
+
+def encode_message(bits, encoding, short_us, long_us):
+    """
+    Convierte los bits de un mensaje en duraciones alternas pulso/gap (μs)
+
+    Convenciones iguales a las del decodificador de shadow_pulse:
+    pwm corto = 1, ppm gap largo = 1 (con pulso de parada tras el ultimo
+    gap), manchester IEEE 802.3 con medio bit bajo inicial (short_us es el
+    medio bit).
+
+    Returns:
+        ndarray: Duraciones p0, g0, p1, ... terminando en pulso
+    """
+    bits = np.asarray(bits, dtype=np.int64)
+
+    if encoding == 'pwm':
+        durations = np.empty(2 * len(bits), dtype=np.int64)
+        durations[0::2] = np.where(bits, short_us, long_us)
+        durations[1::2] = np.where(bits, long_us, short_us)
+        return durations[:-1]
+
+    if encoding == 'ppm':
+        # Un gap por bit y pulso de parada final: N + 1 pulsos
+        durations = np.empty(2 * len(bits) + 1, dtype=np.int64)
+        durations[0::2] = short_us
+        durations[1::2] = np.where(bits, long_us, short_us)
+        return durations
+
+    # Manchester: medios bits y luego longitudes de racha
+    halves = np.empty(2 * len(bits) + 2, dtype=np.int64)
+    halves[0] = 0
+    halves[1:-1:2] = 1 - bits
+    halves[2:-1:2] = bits
+    halves[-1] = 0
+    changes = np.flatnonzero(np.diff(halves)) + 1
+    runs = np.diff(changes) * short_us  # Desde el primer alto hasta el ultimo bajo
+    return runs
+
+
+def generate_ook(n_messages=20, bits_per_message=24, sample_rate=250000, snr_db=20.0,
+                 short_us=300, long_us=900, separator_us=9000, encoding='pwm',
+                 amplitude=60.0, seed=0, offset_hz=0.0):
+    """
+    Genera una captura OOK sintetica junto con su verdad de referencia
+
+    Args:
+        n_messages (int): Mensajes en la captura
+        bits_per_message (int): Bits aleatorios por mensaje
+        sample_rate (int): Frecuencia de muestreo (Hz)
+        snr_db (float): Relacion amplitud de portadora / sigma de ruido (dB)
+        short_us (int): Simbolo corto (o medio bit en manchester) en μs
+        long_us (int): Simbolo largo en μs
+        separator_us (int): Gap entre mensajes en μs
+        encoding (str): 'pwm', 'ppm' o 'manchester'
+        amplitude (float): Amplitud de la portadora (escala cu8, max 127)
+        seed (int): Semilla del generador aleatorio
+        offset_hz (float): Desplazamiento de la portadora respecto al centro
+
+    Yields:
+        tuple: (bytes IQ del mensaje, duraciones μs, bits) uno por mensaje;
+               el primer bloque incluye el silencio inicial
+    """
+    rng = np.random.default_rng(seed)
+    samples_per_us = sample_rate / 1e6
+    noise_sigma = amplitude / 10 ** (snr_db / 20)
+    position = 0  # Muestra absoluta (fase continua de la portadora)
+
+    for index in range(n_messages):
+        bits = rng.integers(0, 2, bits_per_message)
+        durations = encode_message(bits, encoding, short_us, long_us)
+
+        # Envolvente: bordes redondeados al entero de muestras mas cercano
+        edges = np.rint(np.cumsum(durations) * samples_per_us).astype(np.int64)
+        lead_in = int(LEAD_IN_US * samples_per_us) if index == 0 else 0
+        total = lead_in + edges[-1] + int(separator_us * samples_per_us)
+
+        envelope = np.zeros(total, dtype=np.float32)
+        starts = np.concatenate(([0], edges[1:-1:2])) + lead_in
+        ends = edges[0::2] + lead_in
+        marks = np.zeros(total + 1, dtype=np.int32)
+        np.add.at(marks, starts, 1)
+        np.add.at(marks, ends, -1)
+        envelope[:] = np.cumsum(marks[:-1]) > 0
+
+        # Portadora (fase aleatoria por mensaje, offset_hz) + ruido gaussiano en I y Q
+        phase = rng.uniform(0, 2 * np.pi)
+        if offset_hz:
+            phase = phase + 2 * np.pi * offset_hz / sample_rate * (position + np.arange(total))
+        position += total
+
+        iq = np.empty(2 * total, dtype=np.float32)
+        iq[0::2] = envelope * (amplitude * np.cos(phase))
+        iq[1::2] = envelope * (amplitude * np.sin(phase))
+        iq += rng.normal(127.5, noise_sigma, 2 * total).astype(np.float32)
+
+        # Duraciones reales tras cuantizar a muestras
+        true_durations = np.diff(np.concatenate(([0], edges))) / samples_per_us
+
+        yield (np.clip(np.rint(iq), 0, 255).astype(np.uint8).tobytes(),
+               true_durations, bits)
+
+
+def write_capture(filename, **options):
+    """
+    Escribe una captura sintetica mensaje a mensaje ('-' = stdout, para
+    encadenarla con shadow_pulse.py -)
+
+    Returns:
+        dict: Verdad de referencia: 'pulses' y 'gaps' (μs, gaps entre
+              mensajes incluidos como separador) y 'bits' por mensaje
+    """
+    separator_us = options.get('separator_us', 9000)
+    pulses = []
+    gaps = []
+    bits = []
+
+    output = nullcontext(sys.stdout.buffer) if filename == '-' else open(filename, 'wb')
+    with output as f:
+        for index, (iq_bytes, durations, message_bits) in enumerate(generate_ook(**options)):
+            f.write(iq_bytes)
+            if index:
+                gaps.append(np.array([separator_us]))
+            pulses.append(durations[0::2])
+            gaps.append(durations[1::2])
+            bits.append(message_bits)
+
+    return {
+        'pulses': np.concatenate(pulses) if pulses else np.empty(0),
+        'gaps': np.concatenate(gaps) if gaps else np.empty(0),
+        'bits': bits,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generador de capturas OOK cu8 sinteticas')
+    parser.add_argument('output', help="Archivo cu8 de salida ('-' = stdout)")
+    parser.add_argument('-m', '--messages', type=int, default=20,
+                       help='Numero de mensajes (default: 20)')
+    parser.add_argument('-b', '--bits', type=int, default=24,
+                       help='Bits por mensaje (default: 24)')
+    parser.add_argument('-s', '--sample-rate', type=int, default=250000,
+                       help='Frecuencia de muestreo Hz (default: 250000)')
+    parser.add_argument('--snr', type=float, default=20.0,
+                       help='SNR en dB (default: 20)')
+    parser.add_argument('--short', type=int, default=300,
+                       help='Simbolo corto us (default: 300)')
+    parser.add_argument('--long', type=int, default=900,
+                       help='Simbolo largo us (default: 900)')
+    parser.add_argument('--separator', type=int, default=9000,
+                       help='Gap entre mensajes us (default: 9000)')
+    parser.add_argument('-e', '--encoding', choices=['pwm', 'ppm', 'manchester'], default='pwm',
+                       help='Codificacion (default: pwm)')
+    parser.add_argument('--offset', type=float, default=0.0,
+                       help='Desplazamiento de la portadora Hz (default: 0)')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='Semilla aleatoria (default: 0)')
+
+    args = parser.parse_args()
+
+    truth = write_capture(
+        args.output, n_messages=args.messages, bits_per_message=args.bits,
+        sample_rate=args.sample_rate, snr_db=args.snr, short_us=args.short,
+        long_us=args.long, separator_us=args.separator, encoding=args.encoding,
+        seed=args.seed, offset_hz=args.offset,
+    )
+
+    # Informe por stderr: stdout puede ser el propio flujo IQ
+    print(f"Generado {args.output}: {args.messages} mensajes {args.encoding.upper()}, "
+          f"{len(truth['pulses'])} pulsos", file=sys.stderr)
+    for index, bits in enumerate(truth['bits'][:8]):
+        print(f"   [{index}] {np.packbits(bits).tobytes().hex()}", file=sys.stderr)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
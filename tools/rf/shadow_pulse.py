@@ -8,71 +8,989 @@ Usage: python3 shadow_pulse.py <cu8_file> [options]
 """
 
 import numpy as np
-import RPi.GPIO as GPIO
 import time
 import argparse
+import glob
+import hashlib
+import itertools
+import json
+import math
+import mmap
+import os
+import resource
 import sys
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext, redirect_stdout
 from datetime import datetime
+from functools import wraps
+
+from gpio_backend import BACKENDS as GPIO_BACKENDS, SimulatedGPIO, load_backend
+
+GPIO = None  # Backend GPIO (RPi.GPIO o simulado), cargado al configurar el transmisor
+
+# Procesamiento por bloques
+CHUNK_SAMPLES = 1 << 20  # Muestras IQ por bloque (~2MB de archivo)
+
+# Cache de pulsos extraidos
+CACHE_DIR = os.path.expanduser('~/.cache/shadow_pulse')
+CACHE_MAX_MB = 64  # Tamanio maximo de la cache antes de expulsar (LRU)
+
+# Analisis en streaming
+STREAM_BLOCK_SEC = 0.05  # Duracion de cada bloque leido (latencia de deteccion)
+STREAM_HISTORY_SEC = 2.0  # Memoria del histograma de ruido adaptativo
+STREAM_MIN_SNR = 8.0  # Relacion pico/ruido minima para considerar que hay senial
+STREAM_MAX_PULSES = 4096  # Pulsos maximos por mensaje antes de forzar su emision
+
+# Threshold adaptativo por ventanas (capturas largas con deriva de ganancia)
+ADAPTIVE_MIN_SNR = 8.0  # Relacion pico/ruido minima para usar el pico de la ventana
+ADAPTIVE_PEAK_PERCENTILE = 99  # Percentil de pico por ventana (rafagas cortas ocupan poco)
+
+# Deteccion de flancos
+HYSTERESIS = 0.0  # Banda de histeresis relativa al threshold (0 = comparacion simple)
+
+# Channelizer (capturas con varios transmisores a distinta frecuencia)
+CHANNEL_FFT_SIZE = 512  # Muestras por trama del STFT de reconocimiento
+CHANNEL_SNR = 20.0  # Potencia minima de un bin sobre la mediana de su trama (13dB)
+CHANNEL_MIN_SHARE = 0.1  # Tramas activas minimas relativas al bin mas activo
+CHANNEL_MAX_OCCUPANCY = 0.95  # Bins activos en casi todas las tramas (DC, portadora fija): ignorar
+CHANNEL_MERGE_BINS = 2  # Huecos de hasta N bins no separan un canal en dos
+CHANNEL_MIN_BW_HZ = 20000  # Ancho de banda minimo del filtro de canal
+CHANNEL_MAX_RESOLUTION_US = 20  # Limite de la decimacion de cada canal (sin --resolution)
+CHANNEL_MAX_TAPS = 255  # Coeficientes maximos del FIR de canal
+
+# Barrido de parametros (una sola decodificacion IQ para toda la rejilla)
+SWEEP_THRESHOLDS = (1.5, 2.0, 2.5, 3.0, 4.0, 5.0, 6.0)  # Factores de threshold
+SWEEP_MIN_PULSES = (2, 5, 10, 20, 40)  # Pulsos minimos (muestras sin decimar)
+SWEEP_PRINT_LIMIT = 10  # Combinaciones mostradas por consola
+SWEEP_HIST_SAMPLES = 1 << 16  # Duraciones (muestras) contadas con bincount al puntuar; el resto con unique
+
+# Amplitud en punto fijo: uint8 = 1 unidad, uint16 = 1/256 de unidad
+MAGNITUDE_SCALE = {np.dtype(np.uint8): 1, np.dtype(np.uint16): 256}
+_magnitude_luts = {}
+
+# Resultado del agrupamiento de duraciones: centros (μs) y cuentas por grupo,
+# y etiqueta de grupo de cada duracion en su orden original
+DurationClusters = namedtuple('DurationClusters', ['centers', 'counts', 'labels'])
+
+# Mensajes decodificados: codificacion, bits por mensaje, bits empaquetados
+# (una fila por mensaje, MSB primero) y validez de cada mensaje
+DecodedMessages = namedtuple('DecodedMessages', ['encoding', 'bit_counts', 'packed', 'valid'])
+
+# Threshold por ventanas: muestras por ventana y, por ventana, piso de ruido,
+# pico usado, threshold (unidades de amplitud en punto fijo) y si hubo senial
+WindowThresholds = namedtuple('WindowThresholds',
+                              ['window_samples', 'noise', 'peak', 'thresholds', 'active'])
+
+LINE_CODES = ('pwm', 'ppm', 'manchester')
+DECODE_MAIN_SHARE = 0.05  # Fraccion minima de duraciones para considerar un grupo
+DECODE_PRINT_LIMIT = 16  # Mensajes decodificados mostrados por consola
+
+# Indice de tramas unicas
+FRAME_QUANTUM_US = 50  # Rejilla de las duraciones de simbolo en la clave de trama
+
+# Trama unica: clave (hash de la secuencia de simbolos), pulsos y gaps
+# cuantizados (μs), repeticiones y offset (μs) de la primera y ultima aparicion
+UniqueFrame = namedtuple('UniqueFrame', ['key', 'pulses', 'gaps', 'count', 'first_us', 'last_us'])
+
+# Canal detectado por el channelizer: desplazamiento respecto al centro y
+# ancho de banda (Hz), SNR media de sus bins (dB) y fraccion de tramas activas
+Channel = namedtuple('Channel', ['offset_hz', 'bandwidth_hz', 'snr_db', 'occupancy'])
+
+# Resultado del analisis de un canal: canal, decimacion usada y el tren de
+# pulsos con sus grupos y estructura (mismos campos que CU8ReplayDevice)
+ChannelTrain = namedtuple('ChannelTrain', ['channel', 'decimation', 'pulse_train',
+                                           'pulse_clusters', 'gap_clusters', 'message_structure',
+                                           'window_thresholds'])
+
+# Resultado de una combinacion del barrido: parametros, pulsos extraidos,
+# grupos de duraciones, dispersion relativa media respecto al centro de su
+# grupo, fraccion de mensajes con la longitud mas comun, puntuacion y
+# estabilidad (puntuacion media de las combinaciones vecinas en la rejilla)
+SweepResult = namedtuple('SweepResult', ['threshold_factor', 'min_pulse_samples', 'pulses', 'messages',
+                                         'clusters', 'spread', 'consistency', 'coverage', 'score',
+                                         'stability'])
+
+
+def message_hex(decoded):
+    """Lista de mensajes decodificados en hexadecimal"""
+    n_bytes = (decoded.bit_counts + 7) // 8
+    return [row[:size].tobytes().hex() for row, size in zip(decoded.packed, n_bytes.tolist())]
+
+
+def load_gpio(backend='rpi'):
+    """Carga el backend GPIO ('rpi' o 'sim') la primera vez que se necesita transmitir"""
+    global GPIO
+    if GPIO is None:
+        GPIO = load_backend(backend)
+    return GPIO
+
+
+def magnitude_lut(dtype=np.uint16):
+    """
+    Tabla de magnitud para los 65536 pares IQ posibles de un archivo cu8
+
+    La tabla se indexa con cada par (I, Q) visto como un uint16 crudo, en el
+    orden de bytes nativo, y contiene la magnitud escalada segun MAGNITUDE_SCALE.
+
+    Args:
+        dtype: np.uint8 o np.uint16 (tipo de la amplitud resultante)
+
+    Returns:
+        ndarray: Tabla de 65536 entradas del tipo pedido
+    """
+    dtype = np.dtype(dtype)
+    lut = _magnitude_luts.get(dtype)
+
+    if lut is None:
+        pairs = np.arange(65536, dtype=np.uint16).view(np.uint8).astype(np.float64) - 127.5
+        magnitude = np.sqrt(pairs[0::2]**2 + pairs[1::2]**2) * MAGNITUDE_SCALE[dtype]
+        lut = np.round(magnitude).astype(dtype)
+        _magnitude_luts[dtype] = lut
+
+    return lut
+
+
+def iq_magnitude(iq_bytes, dtype=np.uint16):
+    """Calcula la magnitud de bytes IQ intercalados con un solo acceso al LUT"""
+    iq_bytes = np.asarray(iq_bytes, dtype=np.uint8)
+    iq_bytes = iq_bytes[:len(iq_bytes) // 2 * 2]  # Descartar byte IQ incompleto
+
+    return np.take(magnitude_lut(dtype), iq_bytes.view(np.uint16))
+
+
+def histogram_percentile(hist, percentile):
+    """Percentil exacto desde un histograma (misma interpolacion que np.percentile)"""
+    cumulative = np.cumsum(hist)
+    rank = percentile / 100 * (cumulative[-1] - 1)
+    lower = int(rank)
+    fraction = rank - lower
+
+    # Valor de la k-esima muestra ordenada = primer nivel con cumulative > k
+    lower_value = int(np.searchsorted(cumulative, lower, side='right'))
+    if fraction == 0:
+        return float(lower_value)
+
+    upper_value = int(np.searchsorted(cumulative, lower + 1, side='right'))
+    return lower_value + fraction * (upper_value - lower_value)
+
+
+def window_segments(offset, length, window_samples):
+    """
+    Divide un bloque en tramos que no cruzan limites de ventana
+
+    Args:
+        offset (int): Indice absoluto de la primera muestra del bloque
+        length (int): Muestras del bloque
+        window_samples (int): Muestras por ventana
+
+    Yields:
+        tuple: (inicio, fin) relativos al bloque y numero de ventana
+    """
+    start = 0
+    while start < length:
+        window = (offset + start) // window_samples
+        stop = min(length, (window + 1) * window_samples - offset)
+        yield start, stop, window
+        start = stop
+
+
+def boxcar_decimate(amplitude, factor):
+    """
+    Filtro boxcar + decimacion: promedia bloques de factor muestras
+
+    Equivale a un CIC de una etapa. La suma se acumula en uint32 columna a
+    columna (un paso vectorizado por fase), sin temporales float. Las
+    muestras sobrantes al final (menos de factor) se descartan.
+
+    Args:
+        amplitude (ndarray): Amplitud uint8/uint16
+        factor (int): Factor de decimacion
+
+    Returns:
+        ndarray: Amplitud decimada del mismo tipo
+    """
+    if factor <= 1:
+        return amplitude
+
+    blocks = amplitude[:len(amplitude) // factor * factor].reshape(-1, factor)
+    total = blocks[:, 0].astype(np.uint32)
+    for phase in range(1, factor):
+        total += blocks[:, phase]
+
+    total //= factor
+    return total.astype(amplitude.dtype)
+
+
+def iq_complex(iq_bytes):
+    """Bytes IQ intercalados como muestras complex64 centradas en cero"""
+    iq_bytes = np.asarray(iq_bytes, dtype=np.uint8)
+    iq = iq_bytes[:len(iq_bytes) // 2 * 2].astype(np.float32)
+    iq -= 127.5
+
+    return iq.view(np.complex64)
+
+
+def lowpass_taps(cutoff, numtaps):
+    """
+    Coeficientes FIR paso bajo (sinc enventanado con Hamming), ganancia 1 en DC
+
+    Args:
+        cutoff (float): Frecuencia de corte relativa a la de muestreo (0 - 0.5)
+        numtaps (int): Numero de coeficientes (impar: retardo entero)
+
+    Returns:
+        ndarray: Coeficientes float32
+    """
+    n = np.arange(numtaps) - (numtaps - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(numtaps)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+class PulseTrain:
+    """
+    Tren de pulsos compacto: duraciones alternas pulso/gap en un solo buffer
+
+    El buffer int32 contiene p0, g0, p1, g1, ..., pN (μs, termina en pulso).
+    Pulsos y gaps son vistas sin copia del mismo buffer, asi que analisis,
+    cache y replay comparten los datos sin conversiones.
+    """
+
+    __slots__ = ('buffer',)
+
+    def __init__(self, buffer=None):
+        """
+        Args:
+            buffer (ndarray): Duraciones intercaladas int32 (None = tren vacio)
+        """
+        self.buffer = np.empty(0, dtype=np.int32) if buffer is None else buffer
+
+    @classmethod
+    def from_arrays(cls, pulses, gaps):
+        """Intercala pulsos y gaps (len(gaps) == len(pulses) - 1) en un buffer nuevo"""
+        if len(pulses) and len(gaps) != len(pulses) - 1:
+            raise ValueError(f"Se esperaban {len(pulses) - 1} gaps para {len(pulses)} pulsos, hay {len(gaps)}")
+
+        buffer = np.empty(max(0, 2 * len(pulses) - 1), dtype=np.int32)
+        buffer[0::2] = pulses
+        buffer[1::2] = gaps
+        return cls(buffer)
+
+    @property
+    def pulses(self):
+        """Duraciones de los pulsos (vista)"""
+        return self.buffer[0::2]
+
+    @property
+    def gaps(self):
+        """Gaps entre pulsos consecutivos (vista)"""
+        return self.buffer[1::2]
+
+    @property
+    def nbytes(self):
+        return self.buffer.nbytes
+
+    def schedule(self):
+        """Duraciones en segundos como lista de floats (bucle de transmision sin numpy)"""
+        return (self.buffer / 1_000_000).tolist()
+
+    def __len__(self):
+        return (len(self.buffer) + 1) // 2
+
+
+class PulseCache:
+    """
+    Cache en disco de pulsos extraidos, indexada por contenido y parametros
+
+    Cada entrada es un .npz sin comprimir con el buffer del tren de pulsos y
+    los grupos, por lo que un acierto cuesta O(pulsos) y no O(muestras IQ). El
+    hash del archivo se memoriza por (dispositivo, inodo, tamanio, mtime) para
+    no releer la captura, y el tamanio total se acota expulsando las entradas
+    menos usadas (la fecha de modificacion marca el ultimo acceso).
+    """
+
+    VERSION = 3  # Incrementar si cambia el formato o el algoritmo de extraccion
+    DIGEST_INDEX = 'digests.json'
+    MAX_DIGESTS = 4096
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        """
+        Args:
+            cache_dir (str): Directorio de la cache (se crea con permisos 700)
+            max_bytes (int): Tamanio maximo total de las entradas
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+
+    def key(self, filename, params):
+        """Clave de cache para una captura y sus parametros de analisis"""
+        payload = dict(params, digest=self.file_digest(filename), version=self.VERSION)
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def file_digest(self, filename):
+        """SHA-256 del contenido de la captura (memorizado por stat)"""
+        st = os.stat(filename)
+        stat_key = f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+        index_path = os.path.join(self.cache_dir, self.DIGEST_INDEX)
+
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            index = {}
+
+        digest = index.get(stat_key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(filename, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    sha.update(block)
+            digest = sha.hexdigest()
+
+            # Conservar solo las entradas mas recientes
+            index[stat_key] = digest
+            index = dict(list(index.items())[-self.MAX_DIGESTS:])
+            self._atomic_write(index_path, lambda f: f.write(json.dumps(index).encode()))
+
+        return digest
+
+    def load(self, key, device):
+        """
+        Restaura pulsos, gaps, grupos y estructura en el dispositivo
+
+        Returns:
+            bool: True si la entrada existia y era valida
+        """
+        path = os.path.join(self.cache_dir, f"{key}.npz")
+
+        try:
+            with np.load(path) as entry:
+                device.pulse_train = PulseTrain(entry['pulse_train'])
+                device.pulse_clusters = DurationClusters(
+                    entry['pulse_centers'], entry['pulse_counts'], entry['pulse_labels'])
+                device.gap_clusters = DurationClusters(
+                    entry['gap_centers'], entry['gap_counts'], entry['gap_labels'])
+                structure = entry['structure'].tolist()
+
+            os.utime(path)  # Marcar uso reciente para el LRU
+        except (OSError, KeyError, ValueError):
+            return False
+
+        device.message_structure = None
+        if structure:
+            device.message_structure = dict(zip(
+                ('messages', 'separators', 'separator_us', 'bits_per_message'), structure))
+
+        return True
+
+    def store(self, key, device):
+        """Guarda el resultado del analisis y aplica el limite de tamanio"""
+        structure = device.message_structure or {}
+        arrays = {
+            'pulse_train': device.pulse_train.buffer,
+            'pulse_centers': device.pulse_clusters.centers,
+            'pulse_counts': device.pulse_clusters.counts,
+            'pulse_labels': device.pulse_clusters.labels,
+            'gap_centers': device.gap_clusters.centers,
+            'gap_counts': device.gap_clusters.counts,
+            'gap_labels': device.gap_clusters.labels,
+            'structure': np.array(list(structure.values()), dtype=np.int64),
+        }
+
+        self._atomic_write(os.path.join(self.cache_dir, f"{key}.npz"),
+                           lambda f: np.savez(f, **arrays))
+        self._evict()
+
+    def _atomic_write(self, path, writer):
+        """Escribe via archivo temporal + rename (seguro con varios procesos)"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            writer(f)
+        os.replace(tmp_path, path)
+
+    def _evict(self):
+        """Expulsa las entradas menos usadas hasta respetar max_bytes"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.npz'):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class StreamThreshold:
+    """
+    Threshold adaptativo para analisis en streaming
+
+    Mantiene un histograma de amplitud con olvido exponencial para el piso
+    de ruido y una envolvente de pico que decae lentamente, de modo que los
+    silencios entre rafagas no colapsan el threshold sobre el ruido.
+    """
+
+    def __init__(self, levels, threshold_factor, history_samples, min_snr=STREAM_MIN_SNR):
+        """
+        Args:
+            levels (int): Niveles de amplitud posibles
+            threshold_factor (float): Factor para threshold automatico
+            history_samples (int): Constante de tiempo del olvido, en muestras
+            min_snr (float): Relacion pico/ruido minima para activar deteccion
+        """
+        self.hist = np.zeros(levels, dtype=np.float64)
+        self.threshold_factor = threshold_factor
+        self.history_samples = history_samples
+        self.min_snr = min_snr
+        self.peak = 0.0
+
+    def update(self, amplitude):
+        """
+        Incorpora un bloque de amplitud y devuelve el threshold vigente
+
+        Returns:
+            float: Threshold, o None si no hay senial sobre el ruido
+        """
+        decay = np.exp(-len(amplitude) / self.history_samples)
+        block_hist = np.bincount(amplitude, minlength=len(self.hist))
+        self.hist *= decay
+        self.hist += block_hist
+
+        noise_floor = self._percentile(self.hist, 10)
+        block_peak = self._percentile(block_hist, 99)
+        self.peak = max(self.peak * decay, block_peak)
+
+        if self.peak < max(noise_floor, 1.0) * self.min_snr:
+            return None
+
+        return noise_floor + (self.peak - noise_floor) / self.threshold_factor
+
+    @staticmethod
+    def _percentile(hist, percentile):
+        """Nivel bajo el cual queda el percentil pedido del histograma"""
+        cumulative = np.cumsum(hist)
+        return float(np.searchsorted(cumulative, cumulative[-1] * percentile / 100))
+
+
+class WindowedThreshold:
+    """
+    Threshold adaptativo por ventanas fijas para capturas largas
+
+    La amplitud se recorre una sola vez (O(n)) acumulando un histograma
+    exacto por ventana, del que salen el piso de ruido (p10) y el pico. Las
+    ventanas sin senial sobre el ruido toman el pico interpolado de las
+    ventanas con senial vecinas (la ganancia vigente), de modo que los
+    silencios no bajan el threshold hasta el ruido.
+    """
+
+    def __init__(self, levels, window_samples, min_snr=ADAPTIVE_MIN_SNR):
+        """
+        Args:
+            levels (int): Niveles de amplitud posibles
+            window_samples (int): Muestras por ventana
+            min_snr (float): Relacion pico/ruido minima para usar el pico de la ventana
+        """
+        self.window_samples = window_samples
+        self.min_snr = min_snr
+        self.hist = np.zeros(levels, dtype=np.int64)  # Histograma global
+        self._window_hist = np.zeros(levels, dtype=np.int64)
+        self._window = 0
+        self._noise = []
+        self._peak = []
+
+    def add(self, window, hist):
+        """Suma el histograma de un tramo a su ventana (ventanas en orden)"""
+        if window != self._window:
+            self._close_window()
+            self._window = window
+
+        self._window_hist += hist
+        self.hist += hist
+
+    def finish(self, threshold_factor, scale=1):
+        """
+        Cierra la ultima ventana y calcula el threshold de cada una
+
+        Args:
+            threshold_factor (float): Factor para threshold automatico
+            scale (int): Unidades de punto fijo por unidad de amplitud
+
+        Returns:
+            WindowThresholds: Thresholds por ventana
+        """
+        self._close_window()
+
+        noise = np.array(self._noise)
+        peak = np.array(self._peak)
+
+        # Ventanas vacias (submuestreo): piso de ruido global
+        empty = np.isnan(noise)
+        noise[empty] = histogram_percentile(self.hist, 10)
+        active = ~empty & (peak >= np.maximum(noise, scale) * self.min_snr)
+
+        # Ventanas sin senial: pico de las ventanas activas vecinas (o global)
+        windows = np.arange(len(peak))
+        if active.any():
+            peak = np.interp(windows, windows[active], peak[active])
+        else:
+            peak = np.full(len(peak), histogram_percentile(self.hist, 95))
+
+        thresholds = noise + (peak - noise) / threshold_factor
+        return WindowThresholds(self.window_samples, noise, peak, thresholds, active)
+
+    def _close_window(self):
+        if self._window_hist.any():
+            self._noise.append(histogram_percentile(self._window_hist, 10))
+            self._peak.append(histogram_percentile(self._window_hist, ADAPTIVE_PEAK_PERCENTILE))
+        else:
+            self._noise.append(np.nan)
+            self._peak.append(np.nan)
+
+        self._window_hist[:] = 0
+
+
+class SpectrumSurvey:
+    """
+    Reconocimiento espectral (STFT) para localizar los transmisores
+
+    Cada bloque IQ se corta en tramas de fft_size muestras con ventana de
+    Hann, que se transforman todas de una vez con numpy.fft. En cada trama
+    un bin esta activo si supera en snr veces la mediana de la trama (el
+    ruido), de modo que solo se acumulan dos vectores de fft_size valores:
+    la memoria no depende de la duracion de la captura.
+    """
+
+    def __init__(self, sample_rate, fft_size=CHANNEL_FFT_SIZE, snr=CHANNEL_SNR):
+        """
+        Args:
+            sample_rate (int): Frecuencia de muestreo (Hz)
+            fft_size (int): Muestras por trama (resolucion sample_rate / fft_size)
+            snr (float): Relacion de potencia bin/mediana para contar el bin como activo
+        """
+        self.sample_rate = sample_rate
+        self.fft_size = fft_size
+        self.snr = snr
+        self.window = np.hanning(fft_size).astype(np.float32)
+        self.active = np.zeros(fft_size, dtype=np.int64)  # Tramas activas por bin
+        self.active_power = np.zeros(fft_size, dtype=np.float64)  # Potencia en esas tramas
+        self.noise_power = 0.0  # Suma de la mediana de cada trama
+        self.frames = 0
+        self._tail = np.empty(0, dtype=np.complex64)  # Muestras pendientes de completar trama
+
+    def add(self, iq):
+        """Acumula las tramas completas de un bloque complex64 (bloques en orden)"""
+        if len(self._tail):
+            iq = np.concatenate((self._tail, iq))
+
+        n_frames = len(iq) // self.fft_size
+        self._tail = iq[n_frames * self.fft_size:].copy()
+        if n_frames == 0:
+            return
+
+        spectrum = np.fft.fft(iq[:n_frames * self.fft_size].reshape(n_frames, self.fft_size)
+                              * self.window, axis=1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        noise = np.median(power, axis=1, keepdims=True)
+        active = power > noise * self.snr
+
+        self.active += active.sum(axis=0)
+        self.active_power += np.where(active, power, 0).sum(axis=0)
+        self.noise_power += float(noise.sum())
+        self.frames += n_frames
+
+    def channels(self):
+        """
+        Agrupa los bins activos contiguos en canales
+
+        Se descartan los bins con poca actividad (CHANNEL_MIN_SHARE del bin
+        mas activo) y los activos en casi todas las tramas (DC o portadoras
+        continuas, que no son OOK). Los grupos dentro de la banda del filtro
+        de un canal mas fuerte son sus bandas laterales de modulacion.
+
+        Returns:
+            list: Channel ordenados por SNR descendente
+        """
+        if self.frames == 0:
+            return []
+
+        # Bins en orden de frecuencia (-fs/2 .. fs/2)
+        order = np.fft.fftshift(np.arange(self.fft_size))
+        freqs = np.fft.fftshift(np.fft.fftfreq(self.fft_size, 1 / self.sample_rate))
+        active = self.active[order]
+        active_power = self.active_power[order]
+        bin_hz = self.sample_rate / self.fft_size
+        noise = max(self.noise_power / self.frames, 1e-12)
+
+        candidate = (active >= max(1, active.max() * CHANNEL_MIN_SHARE)) & \
+            (active <= self.frames * CHANNEL_MAX_OCCUPANCY)
+        bins = np.flatnonzero(candidate)
+        if len(bins) == 0:
+            return []
+
+        channels = []
+        splits = np.flatnonzero(np.diff(bins) > CHANNEL_MERGE_BINS + 1) + 1
+        for run in np.split(bins, splits):
+            span = slice(run[0], run[-1] + 1)
+            power = active_power[span]
+            mean_power = power.sum() / active[span].sum()
+            channels.append(Channel(
+                offset_hz=float(np.average(freqs[span], weights=power)),
+                bandwidth_hz=float((run[-1] - run[0] + 1) * bin_hz),
+                snr_db=float(10 * np.log10(mean_power / noise)),
+                occupancy=float(active[span].max() / self.frames),
+            ))
+
+        kept = []
+        for channel in sorted(channels, key=lambda channel: channel.snr_db, reverse=True):
+            if all(abs(channel.offset_hz - strong.offset_hz) > max(strong.bandwidth_hz, CHANNEL_MIN_BW_HZ)
+                   for strong in kept):
+                kept.append(channel)
+
+        return kept
+
+
+class ChannelFilter:
+    """
+    Aisla un canal: mezcla a banda base, FIR paso bajo y decimacion por bloques
+
+    El oscilador usa el indice absoluto de muestra (fase continua entre
+    bloques) y el FIR se evalua en forma polifasica: solo se calculan las
+    muestras que sobreviven a la decimacion, con una pasada vectorizada por
+    coeficiente. Las ultimas numtaps - 1 muestras de cada bloque se guardan
+    para filtrar el siguiente sin discontinuidades.
+    """
+
+    def __init__(self, offset_hz, cutoff_hz, sample_rate, decimation):
+        """
+        Args:
+            offset_hz (float): Frecuencia del canal respecto al centro
+            cutoff_hz (float): Frecuencia de corte del paso bajo
+            sample_rate (int): Frecuencia de muestreo de entrada (Hz)
+            decimation (int): Factor de decimacion de la salida
+        """
+        cutoff = cutoff_hz / sample_rate
+        numtaps = min(CHANNEL_MAX_TAPS, max(15, int(3.3 / cutoff) | 1))  # Transicion ~ cutoff
+        self.taps = lowpass_taps(cutoff, numtaps)
+        self.decimation = decimation
+        self.step = -2 * np.pi * offset_hz / sample_rate
+        self.history = np.zeros(numtaps - 1, dtype=np.complex64)
+        self._oscillator = np.empty(0, dtype=np.complex64)
+
+    def process(self, iq, offset):
+        """
+        Filtra un bloque (bloques consecutivos, en orden)
+
+        Args:
+            iq (ndarray): Muestras complex64 del bloque
+            offset (int): Indice absoluto de la primera muestra del bloque
+
+        Returns:
+            ndarray: Muestras complex64 del canal ya decimadas (las sobrantes
+                     al final del bloque, menos de decimation, se descartan)
+        """
+        factor = self.decimation
+        n_out = len(iq) // factor
+        iq = iq[:n_out * factor]
+
+        # Oscilador del bloque (se reutiliza: los bloques tienen el mismo tamanio)
+        if len(self._oscillator) != len(iq):
+            self._oscillator = np.exp(1j * self.step * np.arange(len(iq))).astype(np.complex64)
+        mixed = iq * self._oscillator
+        mixed *= np.complex64(np.exp(1j * (self.step * offset % (2 * np.pi))))
+
+        # y[m] = sum_k h[k] * x[m * factor - k], x precedido del historial
+        extended = np.concatenate((self.history, mixed))
+        history = len(self.history)
+        output = np.zeros(n_out, dtype=np.complex64)
+        for k, tap in enumerate(self.taps):
+            start = history - k
+            output += tap * extended[start:start + n_out * factor:factor]
+
+        self.history = extended[len(extended) - history:].copy()
+        return output
+
+
+class StageProfiler:
+    """
+    Instrumentacion por etapa: tiempo real, CPU, bytes y pico de memoria
+
+    Las etapas se anidan (nombre 'padre/hijo') y las que se repiten con el
+    mismo nombre (p. ej. una por bloque) se acumulan. Desactivado, stage()
+    devuelve un contexto vacio compartido y el coste es una llamada.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}
+        self._open = []  # Pila de etapas abiertas: [ruta, pico absoluto]
+
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name, nbytes=0):
+        """Contexto que mide una etapa (nbytes: datos procesados)"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._measure(name, nbytes)
+
+    def add_bytes(self, nbytes):
+        """Suma bytes procesados a la etapa abierta mas interna"""
+        if self.enabled and self._open:
+            self.stages[self._open[-1][0]]['bytes'] += nbytes
+
+    @contextmanager
+    def _measure(self, name, nbytes):
+        path = f"{self._open[-1][0]}/{name}" if self._open else name
+        record = self.stages.setdefault(path, {
+            'calls': 0, 'wall_sec': 0.0, 'cpu_sec': 0.0, 'bytes': 0, 'peak_bytes': 0,
+        })
+
+        # El pico se reinicia por etapa: las etapas abiertas heredan el anterior
+        current, peak = tracemalloc.get_traced_memory()
+        self._fold_peak(peak)
+        tracemalloc.reset_peak()
+        frame = [path, current]
+        self._open.append(frame)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            record['wall_sec'] += time.perf_counter() - wall_start
+            record['cpu_sec'] += time.process_time() - cpu_start
+            record['calls'] += 1
+            record['bytes'] += nbytes
+
+            self._fold_peak(tracemalloc.get_traced_memory()[1])
+            self._open.pop()
+            record['peak_bytes'] = max(record['peak_bytes'], frame[1] - current)
+
+    def _fold_peak(self, peak):
+        for frame in self._open:
+            frame[1] = max(frame[1], peak)
+
+    def report(self):
+        """Resumen serializable a JSON de todas las etapas medidas"""
+        stages = []
+        for path, record in self.stages.items():
+            wall = record['wall_sec']
+            stages.append({
+                'stage': path,
+                'calls': record['calls'],
+                'wall_sec': round(wall, 6),
+                'cpu_sec': round(record['cpu_sec'], 6),
+                'bytes': record['bytes'],
+                'mb_per_sec': round(record['bytes'] / wall / 1e6, 2) if record['bytes'] and wall > 0 else None,
+                'peak_mb': round(record['peak_bytes'] / (1024 * 1024), 3),
+            })
+
+        return {
+            'stages': stages,
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+
+
+_NULL_STAGE = nullcontext()
+
+
+def profiled(name):
+    """Decorador de metodos: mide la llamada completa con self.profiler"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.profiler.stage(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
 
 class CU8ReplayDevice:
-    def __init__(self, gpio_pin=18, sample_rate=250000):
+    def __init__(self, gpio_pin=18, sample_rate=250000, amplitude_dtype=np.uint16,
+                 init_gpio=True, profile=False, gpio_backend='rpi'):
         """
         Inicializa el dispositivo de replay
 
         Args:
             gpio_pin (int): Pin GPIO del transmisor
             sample_rate (int): Frecuencia de muestreo del archivo cu8
+            amplitude_dtype: Tipo de la amplitud (np.uint8 o np.uint16)
+            init_gpio (bool): Configurar el GPIO ya (False para solo analisis;
+                              replay_signal lo configura al transmitir)
+            profile (bool): Medir tiempo/memoria de cada etapa (self.profiler)
+            gpio_backend (str): 'rpi' (pines reales) o 'sim' (pin simulado que
+                                registra los flancos para medir la temporizacion)
         """
         self.gpio_pin = gpio_pin
+        self.gpio_backend = gpio_backend
         self.sample_rate = sample_rate
         self.time_per_sample = 1.0 / sample_rate
-        self.pulse_data = []
-        self.gap_data = []
-        self.setup_gpio()
+        self.decimation = 1  # Factor de decimacion del ultimo analisis
+        self.adaptive_window = 0  # Muestras por ventana del threshold adaptativo (0 = global)
+        self.hysteresis = 0.0  # Banda de histeresis relativa al threshold (0 = sin histeresis)
+        self.window_thresholds = None  # WindowThresholds del ultimo analisis adaptativo
+        self.amplitude_dtype = np.dtype(amplitude_dtype)
+        self.amplitude_scale = MAGNITUDE_SCALE[self.amplitude_dtype]
+        self.amplitude_levels = int(magnitude_lut(self.amplitude_dtype).max()) + 1
+        self.pulse_train = PulseTrain()
+        self.pulse_clusters = self._cluster_durations(self.pulse_data)
+        self.gap_clusters = self._cluster_durations(self.gap_data)
+        self.message_structure = None
+        self.decoded_messages = None
+        self.frames = None
+        self.channels = None  # Channel detectados por el ultimo analisis con channelizer
+        self.channel_trains = None  # ChannelTrain de cada canal
+        self.gpio_enabled = False
+        self.profiler = StageProfiler(profile)
+
+        if init_gpio:
+            self.setup_gpio()
+            print(f"GPIO {gpio_pin} configurado para transmision")
 
-        print(f"GPIO {gpio_pin} configurado para transmision")
         print(f"Resolucion temporal: {self.time_per_sample * 1e6:.1f}μs por muestra")
 
+    @property
+    def pulse_data(self):
+        """Duraciones de los pulsos en μs (vista de pulse_train)"""
+        return self.pulse_train.pulses
+
+    @property
+    def gap_data(self):
+        """Gaps en μs: gap_data[i] separa pulse_data[i] y pulse_data[i + 1] (vista)"""
+        return self.pulse_train.gaps
+
+    @profiled('gpio_setup')
     def setup_gpio(self):
         """Configura el GPIO para transmision"""
+        load_gpio(self.gpio_backend)
         GPIO.setmode(GPIO.BCM)
         GPIO.setup(self.gpio_pin, GPIO.OUT)
         GPIO.output(self.gpio_pin, GPIO.LOW)
+        self.gpio_enabled = True
 
-    def load_and_analyze_cu8(self, filename, threshold_factor=3.0, min_pulse_samples=10):
+    @profiled('load_and_analyze_cu8')
+    def load_and_analyze_cu8(self, filename, threshold_factor=3.0, min_pulse_samples=10,
+                             chunk_samples=CHUNK_SAMPLES, threshold_subsample=1, cache=None,
+                             resolution_us=0, decode=None, adaptive_window_sec=0,
+                             hysteresis=HYSTERESIS, dedup=False, channelize=False, channel=None):
         """
         Carga archivo cu8, analiza y extrae pulsos en una sola operacion
 
+        El archivo se mapea en memoria y se procesa por bloques, por lo que
+        el consumo de memoria no depende de la duracion de la captura.
+
         Args:
             filename (str): Archivo cu8 a procesar
             threshold_factor (float): Factor para threshold automatico
             min_pulse_samples (int): Minimo de muestras para pulso valido
+            chunk_samples (int): Muestras IQ procesadas por bloque
+            threshold_subsample (int): Usar 1 de cada N muestras para estimar
+                                       el threshold (vista previa rapida)
+            cache (PulseCache): Cache de pulsos extraidos (None para desactivar)
+            resolution_us (float): Decimar la envolvente a esta resolucion
+                                   antes del threshold (0 = resolucion completa)
+            decode (str): Decodificar mensajes ('auto', 'pwm', 'ppm',
+                          'manchester'; None para no decodificar)
+            adaptive_window_sec (float): Threshold propio por ventana de esta
+                                         duracion, para deriva de ganancia/AGC
+                                         (0 = un threshold global)
+            hysteresis (float): Banda de histeresis relativa: sube al superar
+                                threshold * (1 + h) y baja bajo threshold * (1 - h)
+                                (0 = comparacion simple)
+            dedup (bool): Agrupar los mensajes repetidos en tramas unicas
+            channelize (bool): Separar los transmisores por frecuencia y
+                               extraer los pulsos de cada canal por separado
+                               (resolution_us limita entonces la decimacion)
+            channel (int): Canal que queda como senial del dispositivo, por
+                           orden de SNR (None = el de mayor SNR)
 
         Returns:
             bool: True si se extrajo la senial correctamente
         """
         print(f"Cargando {filename}...")
 
-        try:
-            # Cargar archivo cu8
-            with open(filename, 'rb') as f:
-                raw_data = f.read()
-
-            file_size_mb = len(raw_data) / (1024 * 1024)
-            duration_sec = (len(raw_data) // 2) * self.time_per_sample
-
-            print(f"Archivo: {file_size_mb:.1f}MB, Duracion: {duration_sec:.2f}s")
+        self.decimation = 1 if channelize else self._decimation_factor(resolution_us)
+        self.adaptive_window = self._window_samples(adaptive_window_sec)
+        self.window_thresholds = None
+        self.hysteresis = hysteresis
+        self.frames = None
+        self.channels = None
+        self.channel_trains = None
 
-            # Procesar datos IQ
-            amplitude = self._process_iq_data(raw_data)
-            if amplitude is None:
-                return False
+        if channelize:
+            cache = None  # La cache guarda un solo tren de pulsos por captura
 
-            # Detectar pulsos
-            success = self._detect_pulses(amplitude, threshold_factor, min_pulse_samples)
+        try:
+            if cache is not None:
+                with self.profiler.stage('cache_load'):
+                    cache_key = cache.key(filename, self._analysis_params(
+                        threshold_factor, min_pulse_samples, threshold_subsample))
+                    cached = cache.load(cache_key, self)
+
+                if cached:
+                    print(f"Cache: {len(self.pulse_data)} pulsos, {len(self.gap_data)} gaps "
+                          f"recuperados ({cache_key[:12]})")
+                    self._print_signal_structure()
+                    if dedup:
+                        self.index_frames()
+                    if decode:
+                        self.decode_messages(decode)
+                    return True
 
-            if success and self.pulse_data:
-                self._analyze_signal_structure()
+            with open(filename, 'rb') as f:
+                file_size = os.fstat(f.fileno()).st_size
+                n_samples = file_size // 2
+                self.profiler.add_bytes(file_size)
+
+                file_size_mb = file_size / (1024 * 1024)
+                duration_sec = n_samples * self.time_per_sample
+
+                print(f"Archivo: {file_size_mb:.1f}MB, Duracion: {duration_sec:.2f}s")
+
+                if n_samples == 0:
+                    print("Archivo sin muestras IQ")
+                    return False
+
+                if self.decimation > 1:
+                    min_pulse_samples = max(1, round(min_pulse_samples / self.decimation))
+                    print(f"Decimacion: x{self.decimation}, "
+                          f"{self.time_per_sample * self.decimation * 1e6:.1f}μs por muestra, "
+                          f"pulso minimo {min_pulse_samples} muestras")
+
+                # Mapear archivo en memoria (sin copiarlo completo)
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if channelize:
+                        success = self._analyze_channels(
+                            mm, n_samples, threshold_factor, min_pulse_samples, chunk_samples,
+                            threshold_subsample, self._decimation_factor(
+                                resolution_us or CHANNEL_MAX_RESOLUTION_US), channel
+                        )
+                    else:
+                        success = self._analyze_mapped(
+                            mm, n_samples, threshold_factor, min_pulse_samples,
+                            chunk_samples, threshold_subsample
+                        )
+
+            if success and len(self.pulse_data):
+                if not channelize:
+                    self._analyze_signal_structure()  # Con channelizer ya se hizo por canal
+                if cache is not None:
+                    with self.profiler.stage('cache_store'):
+                        cache.store(cache_key, self)
+                if dedup:
+                    self.index_frames()
+                if decode:
+                    self.decode_messages(decode)
                 return True
             else:
                 print("No se detectaron pulsos validos")
@@ -85,21 +1003,477 @@ class CU8ReplayDevice:
             print(f"Error procesando archivo: {e}")
             return False
 
-    def _process_iq_data(self, raw_data):
-        """Procesa datos IQ raw y calcula amplitud"""
+    def _analysis_params(self, threshold_factor, min_pulse_samples, threshold_subsample):
+        """Parametros que determinan el resultado del analisis (clave de cache)"""
+        return {
+            'sample_rate': self.sample_rate,
+            'amplitude_dtype': self.amplitude_dtype.name,
+            'threshold_factor': threshold_factor,
+            'min_pulse_samples': min_pulse_samples,
+            'threshold_subsample': threshold_subsample,
+            'decimation': self.decimation,
+            'adaptive_window': self.adaptive_window,
+            'hysteresis': self.hysteresis,
+        }
+
+    def _decimation_factor(self, resolution_us):
+        """Factor de decimacion para acercarse a la resolucion pedida (μs)"""
+        return max(1, int(resolution_us * 1e-6 * self.sample_rate))
+
+    def _window_samples(self, window_sec):
+        """Muestras (ya decimadas) por ventana del threshold adaptativo (0 = global)"""
+        if window_sec <= 0:
+            return 0
+        return max(1, int(window_sec * self.sample_rate / self.decimation))
+
+    def _analyze_mapped(self, mm, n_samples, threshold_factor, min_pulse_samples,
+                        chunk_samples, threshold_subsample=1, channel=None):
+        """Detecta pulsos sobre un archivo mapeado (o un canal suyo) en dos pasadas por bloques"""
+        # Pasada 1: histograma de amplitud (global o por ventana) para el threshold
+        hist, windows = self._mapped_histogram(mm, n_samples, chunk_samples, threshold_subsample, channel)
+
+        with self.profiler.stage('threshold', hist.nbytes):
+            threshold = self._histogram_threshold(hist, threshold_factor, windows)
+
+        # Pasada 2: flancos con estado entre bloques
+        rising_parts = []
+        falling_parts = []
+        prev_high = None
+
+        for offset, amplitude in self._iter_amplitude(mm, n_samples, chunk_samples, channel):
+            with self.profiler.stage('edges', amplitude.nbytes):
+                rising, falling, prev_high = self._detect_edges(amplitude, threshold, offset, prev_high)
+            rising_parts.append(rising)
+            falling_parts.append(falling)
+
+        with self.profiler.stage('edges'):
+            rising_edges, falling_edges = self._sync_edges(
+                np.concatenate(rising_parts), np.concatenate(falling_parts)
+            )
+
+        with self.profiler.stage('extract', rising_edges.nbytes + falling_edges.nbytes):
+            return self._extract_durations(rising_edges, falling_edges, min_pulse_samples)
+
+    def _mapped_histogram(self, mm, n_samples, chunk_samples, threshold_subsample=1, channel=None):
+        """
+        Pasada de histograma sobre el archivo mapeado
+
+        Returns:
+            tuple: (histograma global, WindowedThreshold o None sin ventanas)
+        """
+        hist = np.zeros(self.amplitude_levels, dtype=np.int64)
+        windows = WindowedThreshold(self.amplitude_levels, self.adaptive_window) \
+            if self.adaptive_window else None
+
+        for offset, amplitude in self._iter_amplitude(mm, n_samples, chunk_samples, channel):
+            with self.profiler.stage('histogram', amplitude.nbytes):
+                if windows is None:
+                    hist += self._amplitude_histogram(amplitude, threshold_subsample, offset)
+                else:
+                    self._add_window_histograms(windows, amplitude, threshold_subsample, offset)
+
+        if windows is not None:
+            hist = windows.hist
+
+        nonzero = np.flatnonzero(hist)
+        scale = self.amplitude_scale
+        print(f"Muestras: {n_samples:,}, Rango amplitud: {nonzero[0] / scale:.1f} - {nonzero[-1] / scale:.1f}")
+
+        return hist, windows
+
+    def _iter_blocks(self, mm, n_samples, chunk_samples):
+        """
+        Itera los bytes IQ del archivo mapeado bloque a bloque
+
+        Las paginas ya procesadas se liberan con madvise para que el RSS
+        se mantenga acotado en capturas grandes; el consumidor no debe
+        conservar el bloque despues de pedir el siguiente.
+
+        Yields:
+            tuple: (indice de la primera muestra del bloque, bytes IQ del bloque)
+        """
+        # Bloques alineados a pagina (madvise) y multiplos del factor de decimacion
+        step = math.lcm(mmap.ALLOCATIONGRANULARITY // 2, self.decimation)
+        chunk_bytes = max(step, chunk_samples // step * step) * 2
+        total_bytes = n_samples * 2
+        can_release = hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_DONTNEED')
+
+        for start in range(0, total_bytes, chunk_bytes):
+            count = min(chunk_bytes, total_bytes - start)
+            block = np.frombuffer(mm, dtype=np.uint8, count=count, offset=start)
+            yield start // 2, block
+            del block  # No retener referencias al mmap entre bloques
+
+            if can_release:
+                mm.madvise(mmap.MADV_DONTNEED, start, count)
+
+    def _iter_amplitude(self, mm, n_samples, chunk_samples, channel=None):
+        """
+        Itera la amplitud del archivo mapeado bloque a bloque
+
+        Si hay decimacion, la amplitud y los indices se entregan ya decimados.
+        La lectura del archivo ocurre al calcular la magnitud (fallos de
+        pagina del mmap), por eso la etapa 'magnitude' del profiler incluye
+        la E/S. Con un canal, la amplitud es la del canal aislado por
+        ChannelFilter (etapa 'channelize'), decimada por el propio filtro.
+
+        Yields:
+            tuple: (indice de la primera muestra del bloque, amplitud del bloque)
+        """
+        channel_filter = None
+        if channel is not None:
+            channel_filter = ChannelFilter(channel.offset_hz, self._channel_cutoff(channel),
+                                           self.sample_rate, self.decimation)
+
+        for offset, block in self._iter_blocks(mm, n_samples, chunk_samples):
+            if channel_filter is not None:
+                with self.profiler.stage('channelize', len(block)):
+                    amplitude = self._channel_amplitude(channel_filter, block, offset)
+            else:
+                with self.profiler.stage('magnitude', len(block)):
+                    amplitude = self._iq_amplitude(block)
+                if self.decimation > 1:
+                    with self.profiler.stage('decimate', amplitude.nbytes):
+                        amplitude = boxcar_decimate(amplitude, self.decimation)
+            del block
+
+            yield offset // self.decimation, amplitude
+
+    def _channel_amplitude(self, channel_filter, iq_bytes, offset):
+        """Amplitud (punto fijo) de un canal aislado a partir de un bloque de bytes IQ"""
+        amplitude = np.abs(channel_filter.process(iq_complex(iq_bytes), offset))
+        amplitude *= self.amplitude_scale
+        np.rint(amplitude, out=amplitude)
+        np.minimum(amplitude, self.amplitude_levels - 1, out=amplitude)
+        return amplitude.astype(self.amplitude_dtype)
+
+    def _channel_cutoff(self, channel):
+        """Frecuencia de corte (Hz) del paso bajo de un canal"""
+        return max(channel.bandwidth_hz, CHANNEL_MIN_BW_HZ) / 2
+
+    def _channel_decimation(self, channel, max_decimation):
+        """Decimacion del canal: Nyquist a ~2x el corte, sin pasar de max_decimation"""
+        return max(1, min(max_decimation, int(self.sample_rate / (4 * self._channel_cutoff(channel)))))
+
+    def _survey_channels(self, mm, n_samples, chunk_samples):
+        """Localiza los canales activos de la captura (una pasada por bloques)"""
+        survey = SpectrumSurvey(self.sample_rate)
+
+        for offset, block in self._iter_blocks(mm, n_samples, chunk_samples):
+            with self.profiler.stage('survey', len(block)):
+                survey.add(iq_complex(block))
+            del block
+
+        channels = survey.channels()
+        bin_hz = self.sample_rate / survey.fft_size
+
+        print(f"\n=== CANALES ({len(channels)}) ===")
+        print(f"STFT: {survey.frames:,} tramas de {survey.fft_size} muestras ({bin_hz:.0f}Hz por bin)")
+        for index, channel in enumerate(channels):
+            print(f"   [{index}] {channel.offset_hz / 1000:+.1f}kHz, BW {channel.bandwidth_hz / 1000:.1f}kHz, "
+                  f"SNR {channel.snr_db:.1f}dB, ocupacion {channel.occupancy:.0%}")
+
+        return channels
+
+    def _analyze_channels(self, mm, n_samples, threshold_factor, min_pulse_samples,
+                          chunk_samples, threshold_subsample=1, max_decimation=1, selected=None):
+        """
+        Separa los transmisores por frecuencia y extrae los pulsos de cada uno
+
+        Tras el reconocimiento espectral, cada canal se aisla con
+        ChannelFilter y pasa por el mismo pipeline de dos pasadas que la
+        magnitud completa. Los resultados quedan en channel_trains y el
+        dispositivo se queda con el canal elegido (select_channel).
+
+        Returns:
+            bool: True si el canal elegido tiene pulsos
+        """
+        self.channels = self._survey_channels(mm, n_samples, chunk_samples)
+        if not self.channels:
+            print("Sin canales separables, se analiza la magnitud completa")
+            return self._analyze_mapped(mm, n_samples, threshold_factor, min_pulse_samples,
+                                        chunk_samples, threshold_subsample)
+
+        window = self.adaptive_window  # Muestras sin decimar
+        trains = []
+
+        for index, channel in enumerate(self.channels):
+            self.decimation = self._channel_decimation(channel, max_decimation)
+            self.adaptive_window = max(1, window // self.decimation) if window else 0
+            self.window_thresholds = None
+            self.pulse_train = PulseTrain()
+            self.pulse_clusters = self._cluster_durations(self.pulse_data)
+            self.gap_clusters = self._cluster_durations(self.gap_data)
+            self.message_structure = None
+            channel_min_pulse = max(1, round(min_pulse_samples / self.decimation))
+
+            print(f"\n=== CANAL {index}: {channel.offset_hz / 1000:+.1f}kHz ===")
+            print(f"Decimacion: x{self.decimation}, "
+                  f"{self.time_per_sample * self.decimation * 1e6:.1f}μs por muestra, "
+                  f"pulso minimo {channel_min_pulse} muestras")
+
+            if self._analyze_mapped(mm, n_samples, threshold_factor, channel_min_pulse,
+                                    chunk_samples, threshold_subsample, channel):
+                self._analyze_signal_structure()
+
+            trains.append(ChannelTrain(channel, self.decimation, self.pulse_train,
+                                       self.pulse_clusters, self.gap_clusters,
+                                       self.message_structure, self.window_thresholds))
+
+        self.channel_trains = trains
+
+        if selected is None or not 0 <= selected < len(trains):
+            if selected is not None:
+                print(f"Canal {selected} inexistente ({len(trains)} detectados), se usa el 0")
+            selected = 0
+
+        return self.select_channel(selected)
+
+    def select_channel(self, index):
+        """
+        Usa el tren de pulsos de un canal (channel_trains) como senial del dispositivo
+
+        Args:
+            index (int): Canal por orden de SNR
+
+        Returns:
+            bool: True si el canal tiene pulsos
+        """
+        train = self.channel_trains[index]
+        self.decimation = train.decimation
+        self.pulse_train = train.pulse_train
+        self.pulse_clusters = train.pulse_clusters
+        self.gap_clusters = train.gap_clusters
+        self.message_structure = train.message_structure
+        self.window_thresholds = train.window_thresholds
+        self.decoded_messages = None
+        self.frames = None
+
+        print(f"\nCanal seleccionado: [{index}] {train.channel.offset_hz / 1000:+.1f}kHz, "
+              f"{len(train.pulse_train)} pulsos")
+        return len(train.pulse_train) > 0
+
+    @profiled('sweep')
+    def sweep_parameters(self, filename, threshold_factors=SWEEP_THRESHOLDS,
+                         min_pulses=SWEEP_MIN_PULSES, chunk_samples=CHUNK_SAMPLES,
+                         threshold_subsample=1, resolution_us=0, adaptive_window_sec=0,
+                         hysteresis=HYSTERESIS):
+        """
+        Evalua una rejilla threshold_factor x min_pulse_samples en un solo analisis
+
+        El IQ se decodifica en las mismas dos pasadas que load_and_analyze_cu8:
+        el histograma es comun a todos los factores, la segunda pasada calcula
+        la amplitud una vez por bloque y detecta los flancos de cada threshold,
+        y cada pulso minimo es solo un filtro sobre esos flancos. Cada
+        combinacion se puntua por lo compactos que son sus grupos de
+        duraciones, por la regularidad de la longitud de los mensajes y por
+        cuantos de esos mensajes recupera frente a la mejor de la rejilla:
+        puntuacion = consistencia * (1 - dispersion) * cobertura.
+
+        Args:
+            filename (str): Archivo cu8 a procesar
+            threshold_factors (sequence): Factores de threshold a evaluar
+            min_pulses (sequence): Pulsos minimos a evaluar (muestras sin decimar)
+            chunk_samples, threshold_subsample, resolution_us, adaptive_window_sec,
+            hysteresis: Igual que en load_and_analyze_cu8
+
+        Returns:
+            list: SweepResult ordenados por puntuacion (mejor primero);
+                  vacia si no se pudo leer la captura
+        """
+        print(f"Cargando {filename}...")
+
+        self.decimation = self._decimation_factor(resolution_us)
+        self.adaptive_window = self._window_samples(adaptive_window_sec)
+        self.window_thresholds = None
+        self.hysteresis = hysteresis
+        threshold_factors = sorted(set(threshold_factors))
+        min_pulses = sorted(set(min_pulses))
+
         try:
-            # Convertir a muestras IQ
-            iq_data = np.frombuffer(raw_data, dtype=np.uint8).astype(np.float32)
-            iq_data = iq_data - 127.5  # Centrar en 0
+            with open(filename, 'rb') as f:
+                file_size = os.fstat(f.fileno()).st_size
+                n_samples = file_size // 2
+                self.profiler.add_bytes(file_size)
+
+                if n_samples == 0:
+                    print("Archivo sin muestras IQ")
+                    return []
 
-            # Separar I y Q
-            i_samples = iq_data[0::2]
-            q_samples = iq_data[1::2]
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    edges = self._sweep_edges(mm, n_samples, threshold_factors,
+                                              chunk_samples, threshold_subsample)
 
-            # Calcular amplitud
-            amplitude = np.sqrt(i_samples**2 + q_samples**2)
+        except FileNotFoundError:
+            print(f"Error: No se encontro el archivo {filename}")
+            return []
+        except Exception as e:
+            print(f"Error procesando archivo: {e}")
+            return []
+
+        results = []
+        with self.profiler.stage('score'):
+            for factor, (rising_edges, falling_edges) in zip(threshold_factors, edges):
+                # Pulsos minimos crecientes: cada filtro parte de los pulsos del anterior
+                for min_pulse in min_pulses:
+                    valid = falling_edges - rising_edges >= max(1, round(min_pulse / self.decimation))
+                    if not valid.all():
+                        rising_edges, falling_edges = rising_edges[valid], falling_edges[valid]
+                    results.append(self._score_sweep(factor, min_pulse, rising_edges, falling_edges))
+
+            # Cobertura: mensajes consistentes frente a la mejor combinacion, para
+            # que unos pocos pulsos regulares no puntuen como una captura completa
+            most_messages = max(result.messages for result in results)
+            results = [result._replace(coverage=round(result.messages / most_messages, 4) if most_messages else 0.0)
+                       for result in results]
+            results = [result._replace(score=round(result.consistency * (1 - min(result.spread, 1.0))
+                                                   * result.coverage, 4))
+                       for result in results]
+
+            # Empates: mejor la combinacion en el centro de la zona estable
+            scores = np.array([result.score for result in results]).reshape(
+                len(threshold_factors), len(min_pulses))
+            padded = np.pad(scores, 1)  # Fuera de la rejilla cuenta como 0
+            stability = sum(padded[1 + row:1 + row + scores.shape[0], 1 + col:1 + col + scores.shape[1]]
+                            for row, col in ((0, 0), (-1, 0), (1, 0), (0, -1), (0, 1))) / 5
+            results = [result._replace(stability=round(float(value), 4))
+                       for result, value in zip(results, stability.ravel())]
+
+        results.sort(key=lambda result: (result.score, result.stability), reverse=True)
+        self._print_sweep(results, len(threshold_factors), len(min_pulses))
+        return results
+
+    def _sweep_edges(self, mm, n_samples, threshold_factors, chunk_samples, threshold_subsample=1):
+        """Flancos sincronizados de cada factor de threshold (una pasada de amplitud)"""
+        hist, windows = self._mapped_histogram(mm, n_samples, chunk_samples, threshold_subsample)
+
+        with self.profiler.stage('threshold', hist.nbytes):
+            thresholds = self._sweep_thresholds(hist, windows, threshold_factors)
+
+        rising_parts = [[] for _ in thresholds]
+        falling_parts = [[] for _ in thresholds]
+        prev_high = [None] * len(thresholds)
+
+        for offset, amplitude in self._iter_amplitude(mm, n_samples, chunk_samples):
+            with self.profiler.stage('edges', amplitude.nbytes * len(thresholds)):
+                for index, threshold in enumerate(thresholds):
+                    rising, falling, prev_high[index] = self._detect_edges(
+                        amplitude, threshold, offset, prev_high[index])
+                    rising_parts[index].append(rising)
+                    falling_parts[index].append(falling)
+
+        with self.profiler.stage('edges'):
+            return [self._sync_edges(np.concatenate(rising), np.concatenate(falling))
+                    for rising, falling in zip(rising_parts, falling_parts)]
+
+    def _sweep_thresholds(self, hist, windows, threshold_factors):
+        """Threshold (global o por ventana) de cada factor, con ruido y pico comunes"""
+        if windows is not None:
+            base = self._compute_window_thresholds(windows, threshold_factors[0])
+            return [base._replace(thresholds=base.noise + (base.peak - base.noise) / factor)
+                    for factor in threshold_factors]
+
+        noise_floor = self._histogram_percentile(hist, 10)
+        signal_peak = self._histogram_percentile(hist, 95)
+
+        scale = self.amplitude_scale
+        print(f"Ruido: {noise_floor / scale:.1f}, Pico: {signal_peak / scale:.1f}")
+
+        return [noise_floor + (signal_peak - noise_floor) / factor for factor in threshold_factors]
+
+    def _score_sweep(self, threshold_factor, min_pulse_samples, rising_edges, falling_edges):
+        """
+        Puntua los pulsos de una combinacion del barrido
+
+        dispersion: desviacion relativa media de cada duracion respecto al
+        centro de su grupo (0 = grupos perfectamente compactos).
+        consistencia: fraccion de mensajes con el numero de pulsos mas
+        comun (0 si no hay separadores de mensaje); mensajes: cuantos lo
+        tienen. La cobertura, la puntuacion y la estabilidad las rellena
+        sweep_parameters con la rejilla completa.
+
+        Los grupos se forman sobre el histograma de anchos en muestras
+        (bincount, sin ordenar millones de duraciones por combinacion) con
+        la misma regla que _cluster_durations.
+        """
+        pulse_samples = falling_edges - rising_edges
+        gap_samples = rising_edges[1:] - falling_edges[:-1]
+
+        if len(gap_samples) == 0:
+            return SweepResult(threshold_factor, min_pulse_samples, len(pulse_samples), 0, 0, 1.0, 0.0, 0.0, 0.0, 0.0)
+
+        _, pulse_centers, pulse_deviation = self._width_clusters(pulse_samples)
+        gap_first_widths, gap_centers, gap_deviation = self._width_clusters(gap_samples)
+
+        clusters = len(pulse_centers) + len(gap_centers)
+        spread = (pulse_deviation + gap_deviation) / (len(pulse_samples) + len(gap_samples))
+        consistency = 0.0
+        messages = 0
+
+        # El ultimo grupo de gaps es el de los separadores (ancho minimo en muestras)
+        if self._has_separator(gap_centers):
+            separators = np.flatnonzero(gap_samples >= gap_first_widths[-1])
+            lengths = np.diff(np.concatenate(([-1], separators, [len(pulse_samples) - 1])))
+            messages = int(np.bincount(lengths).max())
+            consistency = messages / len(lengths)
+
+        return SweepResult(threshold_factor, min_pulse_samples, len(pulse_samples), messages, clusters,
+                           round(spread, 4), round(consistency, 4), 0.0, 0.0, 0.0)
+
+    def _width_clusters(self, samples):
+        """
+        Grupos de duracion de unos anchos en muestras, sobre su histograma
 
-            print(f"Muestras: {len(amplitude):,}, Rango amplitud: {np.min(amplitude):.1f} - {np.max(amplitude):.1f}")
+        Returns:
+            tuple: (ancho minimo en muestras de cada grupo, centros en μs,
+                    suma de las desviaciones relativas al centro de su grupo)
+        """
+        us_per_sample = self.time_per_sample * self.decimation * 1e6
+        widths, counts = self._width_histogram(samples)
+        durations = (widths * us_per_sample).astype(np.int64)
+        starts = self._cluster_starts(durations, cumulative=np.cumsum(counts))
+        centers = np.add.reduceat(durations * counts, starts) // np.add.reduceat(counts, starts)
+
+        center = np.maximum(np.repeat(centers, np.diff(np.append(starts, len(widths)))), 1)
+        deviation = float((counts * (np.abs(durations - center) / center)).sum())
+        return widths[starts], centers, deviation
+
+    def _width_histogram(self, samples):
+        """Anchos distintos (muestras, ordenados) y cuantas veces aparece cada uno"""
+        short = samples < SWEEP_HIST_SAMPLES
+        counts = np.bincount(samples[short])
+        widths = np.flatnonzero(counts)
+        long_widths, long_counts = np.unique(samples[~short], return_counts=True)
+        return np.concatenate((widths, long_widths)), np.concatenate((counts[widths], long_counts))
+
+    def _print_sweep(self, results, n_factors, n_min_pulses):
+        """Muestra las mejores combinaciones del barrido"""
+        print(f"\n=== BARRIDO ({n_factors} thresholds x {n_min_pulses} pulsos minimos) ===")
+        print(f"   {'-t':>5} {'min':>5} {'pulsos':>7} {'mensajes':>9} {'grupos':>7} {'dispersion':>11} "
+              f"{'consistencia':>13} {'cobertura':>10} {'score':>6} {'estable':>8}")
+        for result in results[:SWEEP_PRINT_LIMIT]:
+            print(f"   {result.threshold_factor:5.1f} {result.min_pulse_samples:5d} {result.pulses:7d} "
+                  f"{result.messages:9d} {result.clusters:7d} {result.spread:11.1%} {result.consistency:13.1%} "
+                  f"{result.coverage:10.1%} {result.score:6.3f} {result.stability:8.3f}")
+
+        if results and results[0].score > 0:
+            best = results[0]
+            print(f"Mejores parametros: -t {best.threshold_factor:g} --min-pulse {best.min_pulse_samples}")
+        else:
+            print("Ninguna combinacion produjo mensajes consistentes")
+
+    def _iq_amplitude(self, iq_bytes):
+        """Calcula la amplitud (punto fijo) de un bloque de bytes IQ intercalados"""
+        return iq_magnitude(iq_bytes, self.amplitude_dtype)
+
+    def _process_iq_data(self, raw_data):
+        """Procesa datos IQ raw y calcula amplitud"""
+        try:
+            with self.profiler.stage('magnitude', len(raw_data)):
+                amplitude = self._iq_amplitude(np.frombuffer(raw_data, dtype=np.uint8))
+
+            scale = self.amplitude_scale
+            print(f"Muestras: {len(amplitude):,}, Rango amplitud: {np.min(amplitude) / scale:.1f} - {np.max(amplitude) / scale:.1f}")
 
             return amplitude
 
@@ -107,31 +1481,224 @@ class CU8ReplayDevice:
             print(f"Error procesando datos IQ: {e}")
             return None
 
-    def _detect_pulses(self, amplitude, threshold_factor, min_pulse_samples):
-        """Detecta pulsos y gaps en la senial"""
-        # Calcular threshold automatico
-        noise_floor = np.percentile(amplitude, 10)  # 10% mas bajo como ruido
-        signal_peak = np.percentile(amplitude, 95)   # 95% como pico
+    def _amplitude_histogram(self, amplitude, subsample=1, offset=0):
+        """
+        Histograma exacto de la amplitud en punto fijo (un bin por nivel)
+
+        Args:
+            amplitude (ndarray): Amplitud uint8/uint16
+            subsample (int): Contar solo 1 de cada N muestras
+            offset (int): Indice absoluto de la primera muestra, para que el
+                          submuestreo sea continuo entre bloques
+
+        Returns:
+            ndarray: Cuentas por nivel de amplitud
+        """
+        hist = np.zeros(self.amplitude_levels, dtype=np.int64)
+        samples = amplitude[(-offset) % subsample::subsample]
+
+        # bincount convierte a intp: acotar la copia temporal por bloques
+        for start in range(0, len(samples), CHUNK_SAMPLES):
+            hist += np.bincount(samples[start:start + CHUNK_SAMPLES], minlength=len(hist))
+
+        return hist
+
+    def _histogram_percentile(self, hist, percentile):
+        """Percentil exacto desde el histograma (misma interpolacion que np.percentile)"""
+        return histogram_percentile(hist, percentile)
+
+    def _histogram_threshold(self, hist, threshold_factor, windows=None):
+        """
+        Threshold automatico a partir del histograma de amplitud
+
+        Args:
+            hist (ndarray): Histograma global de amplitud
+            threshold_factor (float): Factor para threshold automatico
+            windows (WindowedThreshold): Histogramas por ventana (None = global)
+
+        Returns:
+            float o WindowThresholds: Threshold global o uno por ventana
+        """
+        if windows is not None:
+            return self._compute_window_thresholds(windows, threshold_factor)
+
+        noise_floor = self._histogram_percentile(hist, 10)  # 10% mas bajo como ruido
+        signal_peak = self._histogram_percentile(hist, 95)  # 95% como pico
+        return self._compute_threshold(noise_floor, signal_peak, threshold_factor)
+
+    def _add_window_histograms(self, windows, amplitude, subsample=1, offset=0):
+        """Acumula el histograma de un bloque tramo a tramo en sus ventanas"""
+        for start, stop, window in window_segments(offset, len(amplitude), windows.window_samples):
+            windows.add(window, self._amplitude_histogram(amplitude[start:stop], subsample, offset + start))
+
+    def _compute_window_thresholds(self, windows, threshold_factor):
+        """Calcula y guarda los thresholds por ventana (self.window_thresholds)"""
+        self.window_thresholds = windows.finish(threshold_factor, self.amplitude_scale)
+
+        scale = self.amplitude_scale
+        noise = self.window_thresholds.noise / scale
+        thresholds = self.window_thresholds.thresholds / scale
+        window_sec = windows.window_samples * self.decimation * self.time_per_sample
+
+        print(f"Threshold adaptativo: {len(thresholds)} ventanas de {window_sec:.2f}s, "
+              f"{int(self.window_thresholds.active.sum())} con senial")
+        print(f"Ruido: {noise.min():.1f} - {noise.max():.1f}, "
+              f"Threshold: {thresholds.min():.1f} - {thresholds.max():.1f}")
+
+        return self.window_thresholds
+
+    def _above_threshold(self, amplitude, threshold, offset=0):
+        """Mascara alto/bajo con un threshold global o uno por ventana"""
+        if not isinstance(threshold, WindowThresholds):
+            return amplitude > threshold
+
+        signal_high = np.empty(len(amplitude), dtype=bool)
+        for start, stop, window in window_segments(offset, len(amplitude), threshold.window_samples):
+            np.greater(amplitude[start:stop], threshold.thresholds[window], out=signal_high[start:stop])
+
+        return signal_high
+
+    def _compute_threshold(self, noise_floor, signal_peak, threshold_factor):
+        """Calcula el threshold entre ruido y pico"""
         threshold = noise_floor + (signal_peak - noise_floor) / threshold_factor
 
-        print(f"Ruido: {noise_floor:.1f}, Pico: {signal_peak:.1f}, Threshold: {threshold:.1f}")
+        scale = self.amplitude_scale
+        print(f"Ruido: {noise_floor / scale:.1f}, Pico: {signal_peak / scale:.1f}, Threshold: {threshold / scale:.1f}")
 
-        # Detectar senial alta/baja
-        signal_high = amplitude > threshold
+        return threshold
 
-        # Encontrar transiciones
-        transitions = np.diff(signal_high.astype(int))
-        rising_edges = np.where(transitions == 1)[0] + 1
-        falling_edges = np.where(transitions == -1)[0] + 1
+    def _detect_pulses(self, amplitude, threshold_factor, min_pulse_samples, threshold_subsample=1):
+        """Detecta pulsos y gaps en la senial"""
+        # Calcular threshold automatico (global o por ventana)
+        windows = WindowedThreshold(self.amplitude_levels, self.adaptive_window) \
+            if self.adaptive_window else None
 
-        # Sincronizar flancos
+        with self.profiler.stage('histogram', amplitude.nbytes):
+            if windows is None:
+                hist = self._amplitude_histogram(amplitude, threshold_subsample)
+            else:
+                self._add_window_histograms(windows, amplitude, threshold_subsample)
+                hist = windows.hist
+        with self.profiler.stage('threshold', hist.nbytes):
+            threshold = self._histogram_threshold(hist, threshold_factor, windows)
+
+        # Detectar senial alta/baja y encontrar transiciones
+        with self.profiler.stage('edges', amplitude.nbytes):
+            rising_edges, falling_edges, _ = self._detect_edges(amplitude, threshold)
+            rising_edges, falling_edges = self._sync_edges(rising_edges, falling_edges)
+
+        with self.profiler.stage('extract', rising_edges.nbytes + falling_edges.nbytes):
+            return self._extract_durations(rising_edges, falling_edges, min_pulse_samples)
+
+    def _detect_edges(self, amplitude, threshold, offset=0, prev_high=None):
+        """
+        Flancos de un bloque de amplitud, con o sin histeresis (self.hysteresis)
+
+        Returns:
+            tuple: (flancos de subida, flancos de bajada, estado final)
+        """
+        if not self.hysteresis:
+            return self._find_edges(self._above_threshold(amplitude, threshold, offset),
+                                    offset, prev_high)
+
+        above_high = self._above_threshold(amplitude, self._scale_threshold(threshold, 1 + self.hysteresis), offset)
+        below_low = ~self._above_threshold(amplitude, self._scale_threshold(threshold, 1 - self.hysteresis), offset)
+        return self._find_edges_hysteresis(above_high, below_low, offset, prev_high)
+
+    def _scale_threshold(self, threshold, factor):
+        """Threshold global o por ventana multiplicado por factor"""
+        if isinstance(threshold, WindowThresholds):
+            return threshold._replace(thresholds=threshold.thresholds * factor)
+        return threshold * factor
+
+    def _find_edges_hysteresis(self, above_high, below_low, offset=0, prev_high=None):
+        """
+        Flancos con histeresis (Schmitt trigger) sin bucle por muestra
+
+        El estado pasa a alto al superar el threshold alto y a bajo al caer
+        bajo el bajo; entre ambos conserva el anterior (forward-fill). En vez
+        de rellenar muestra a muestra se trabaja sobre los eventos de entrada
+        en cada zona: un evento cambia el estado solo si su valor difiere del
+        evento previo, asi el ruido que cruza un solo threshold no genera flancos.
+
+        Args:
+            above_high (ndarray): Mascara amplitud > threshold alto
+            below_low (ndarray): Mascara amplitud <= threshold bajo
+            offset (int): Indice absoluto de la primera muestra del bloque
+            prev_high (bool): Estado al final del bloque anterior
+                              (None si es el primer bloque)
+
+        Returns:
+            tuple: (flancos de subida, flancos de bajada, estado final)
+        """
+        # Primeras muestras de cada racha sobre el alto / bajo el bajo
+        high_entries = np.flatnonzero(np.diff(above_high.view(np.int8), prepend=np.int8(0)) == 1)
+        low_entries = np.flatnonzero(np.diff(below_low.view(np.int8), prepend=np.int8(0)) == 1)
+
+        events = np.concatenate((high_entries, low_entries))
+        values = np.concatenate((np.ones(len(high_entries), dtype=bool),
+                                 np.zeros(len(low_entries), dtype=bool)))
+        order = np.argsort(events, kind='stable')
+        events = events[order]
+        values = values[order]
+
+        if len(events) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, prev_high
+
+        if prev_high is None:
+            prev_high = values[0]
+
+        changes = values != np.concatenate(([prev_high], values[:-1]))
+        rising_edges = events[changes & values] + offset
+        falling_edges = events[changes & ~values] + offset
+
+        return rising_edges, falling_edges, bool(values[-1])
+
+    def _find_edges(self, signal_high, offset=0, prev_high=None):
+        """
+        Encuentra flancos en un bloque de senial binaria
+
+        Args:
+            signal_high (ndarray): Mascara booleana alto/bajo del bloque
+            offset (int): Indice absoluto de la primera muestra del bloque
+            prev_high (bool): Estado de la ultima muestra del bloque anterior
+                              (None si es el primer bloque)
+
+        Returns:
+            tuple: (flancos de subida, flancos de bajada, estado final)
+        """
+        if len(signal_high) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, prev_high
+
+        if prev_high is None:
+            prev_high = signal_high[0]
+
+        transitions = np.diff(signal_high.astype(np.int8), prepend=np.int8(prev_high))
+        rising_edges = np.flatnonzero(transitions == 1) + offset
+        falling_edges = np.flatnonzero(transitions == -1) + offset
+
+        return rising_edges, falling_edges, bool(signal_high[-1])
+
+    def _sync_edges(self, rising_edges, falling_edges):
+        """Sincroniza flancos para que cada subida tenga su bajada"""
         if len(falling_edges) > 0 and len(rising_edges) > 0:
             if falling_edges[0] < rising_edges[0]:
                 falling_edges = falling_edges[1:]
 
         min_edges = min(len(rising_edges), len(falling_edges))
-        rising_edges = rising_edges[:min_edges]
-        falling_edges = falling_edges[:min_edges]
+        return rising_edges[:min_edges], falling_edges[:min_edges]
+
+    def _extract_durations(self, rising_edges, falling_edges, min_pulse_samples):
+        """
+        Extrae duraciones de pulsos y gaps a partir de flancos sincronizados
+
+        Los pulsos mas cortos que min_pulse_samples se descartan y su duracion
+        se funde con los gaps vecinos, de modo que gap_data[i] siempre es la
+        pausa entre pulse_data[i] y pulse_data[i + 1].
+        """
+        min_edges = len(rising_edges)
 
         if min_edges == 0:
             print("No se detectaron transiciones validas")
@@ -139,101 +1706,565 @@ class CU8ReplayDevice:
 
         print(f"Transiciones: {min_edges} pulsos detectados")
 
-        # Extraer duraciones
-        pulses = []
-        gaps = []
-
-        for i in range(len(rising_edges)):
-            # Duracion del pulso
-            pulse_samples = falling_edges[i] - rising_edges[i]
-            if pulse_samples >= min_pulse_samples:
-                pulse_duration_us = int(pulse_samples * self.time_per_sample * 1e6)
-                pulses.append(pulse_duration_us)
+        # Descartar glitches: los gaps se miden entre pulsos validos
+        valid = (falling_edges - rising_edges) >= min_pulse_samples
+        rising_edges = rising_edges[valid]
+        falling_edges = falling_edges[valid]
 
-                # Duracion del gap
-                if i < len(rising_edges) - 1:
-                    gap_samples = rising_edges[i + 1] - falling_edges[i]
-                    gap_duration_us = int(gap_samples * self.time_per_sample * 1e6)
-                    gaps.append(gap_duration_us)
+        us_per_sample = self.time_per_sample * self.decimation * 1e6
+        pulses = ((falling_edges - rising_edges) * us_per_sample).astype(np.int32)
+        gaps = ((rising_edges[1:] - falling_edges[:-1]) * us_per_sample).astype(np.int32)
 
-        self.pulse_data = pulses
-        self.gap_data = gaps
+        self.pulse_train = PulseTrain.from_arrays(pulses, gaps)
 
         print(f"Extraidos: {len(pulses)} pulsos, {len(gaps)} gaps")
 
-        if pulses:
-            print(f"Rango pulsos: {min(pulses)} - {max(pulses)}μs")
-            if gaps:
-                print(f"Rango gaps: {min(gaps)} - {max(gaps)}μs")
+        if len(pulses):
+            print(f"Rango pulsos: {pulses.min()} - {pulses.max()}μs")
+            if len(gaps):
+                print(f"Rango gaps: {gaps.min()} - {gaps.max()}μs")
             return True
 
         return False
 
+    @profiled('structure')
     def _analyze_signal_structure(self):
         """Analiza estructura de la senial detectada"""
-        if not self.pulse_data:
+        if len(self.pulse_data) == 0:
             return
 
+        # Agrupar pulsos y gaps similares
+        self.pulse_clusters = self._cluster_durations(self.pulse_data)
+        self.gap_clusters = self._cluster_durations(self.gap_data)
+        self.message_structure = None
+
+        # Detectar separadores de mensaje
+        gap_centers, gap_counts, _ = self.gap_clusters
+        if self._has_separator(gap_centers):
+            separators = int(gap_counts[-1])
+            messages = separators + 1
+            self.message_structure = {
+                'messages': messages,
+                'separators': separators,
+                'separator_us': int(gap_centers[-1]),
+                'bits_per_message': len(self.pulse_data) // messages,
+            }
+
+        self._print_signal_structure()
+
+    def _has_separator(self, gap_centers):
+        """True si el grupo de gaps mas largo separa mensajes (> 2x los gaps regulares)"""
+        if len(gap_centers) < 2:
+            return False
+
+        longest_gap = int(gap_centers[-1])
+        regular_gaps = gap_centers[gap_centers < longest_gap / 2]
+        return bool(len(regular_gaps)) and longest_gap > regular_gaps.max() * 2
+
+    def _print_signal_structure(self):
+        """Muestra los grupos de duraciones y la estructura detectada"""
         print(f"\n=== ANALISIS ===")
 
-        # Agrupar pulsos similares
-        pulse_groups = self._group_durations(self.pulse_data)
-        print(f"Tipos de PULSOS ({len(pulse_groups)}):")
-        for i, (duration, count) in enumerate(pulse_groups.items()):
+        pulse_centers, pulse_counts, _ = self.pulse_clusters
+        print(f"Tipos de PULSOS ({len(pulse_centers)}):")
+        for i, (duration, count) in enumerate(zip(pulse_centers, pulse_counts)):
             print(f"   [{i}] {duration:,}μs (x{count})")
 
-        # Agrupar gaps si existen
-        if self.gap_data:
-            gap_groups = self._group_durations(self.gap_data)
-            print(f"Tipos de GAPS ({len(gap_groups)}):")
-            for i, (duration, count) in enumerate(gap_groups.items()):
+        if len(self.gap_data):
+            gap_centers, gap_counts, _ = self.gap_clusters
+            print(f"Tipos de GAPS ({len(gap_centers)}):")
+            for i, (duration, count) in enumerate(zip(gap_centers, gap_counts)):
                 print(f"   [{i}] {duration:,}μs (x{count})")
 
-            # Detectar separadores de mensaje
-            gap_list = list(gap_groups.keys())
-            if len(gap_list) >= 2:
-                longest_gap = max(gap_list)
-                regular_gaps = [g for g in gap_list if g < longest_gap / 2]
+        if self.message_structure:
+            print(f"Estructura detectada:")
+            print(f"   Mensajes: {self.message_structure['messages']}")
+            print(f"   Separadores: {self.message_structure['separators']} "
+                  f"de {self.message_structure['separator_us']:,}μs")
+            print(f"   Bits por mensaje: ~{self.message_structure['bits_per_message']}")
+
+    @profiled('decode')
+    def decode_messages(self, encoding='auto'):
+        """
+        Decodifica los mensajes OOK a bits y bytes
+
+        Trabaja sobre los grupos ya calculados: cada mensaje se delimita por
+        los gaps separadores y todos los bits de todos los mensajes se
+        obtienen con operaciones vectorizadas.
+
+        Convenciones (las de rtl_433):
+            pwm: pulso corto = 1, pulso largo = 0
+            ppm: gap corto = 0, gap largo = 1
+            manchester: IEEE 802.3 (bajo-alto = 1, alto-bajo = 0); el primer
+                        pulso de cada mensaje puede ser la primera o la segunda
+                        mitad de un bit, se usa la alineacion sin pares invalidos
+
+        Args:
+            encoding (str): 'pwm', 'ppm', 'manchester' o 'auto'
+
+        Returns:
+            DecodedMessages: Resultado, o None si no se pudo decodificar
+        """
+        self.decoded_messages = None
+        if len(self.pulse_data) == 0:
+            return None
+
+        pulses = self.pulse_data.astype(np.int64)
+        gaps = self.gap_data[:len(pulses) - 1].astype(np.int64)
+        pulse_message, separators = self._message_ids(len(gaps))
+        internal = ~separators
+        n_messages = int(pulse_message[-1]) + 1
+
+        pulse_centers = self._main_centers(pulses)
+        gap_centers = self._main_centers(gaps[internal])
+
+        if encoding == 'auto':
+            encoding = self._detect_line_code(pulses, gaps, internal, pulse_centers, gap_centers)
+            if encoding is None:
+                print("Codificacion no reconocida")
+                return None
+
+        bad_messages = np.zeros(n_messages, dtype=bool)
+
+        if encoding == 'pwm':
+            if len(pulse_centers) < 2:
+                print("PWM requiere dos tipos de pulso")
+                return None
+            bits = pulses < (pulse_centers[0] + pulse_centers[1]) / 2
+            bit_message = pulse_message
+
+        elif encoding == 'ppm':
+            if len(gap_centers) < 2:
+                print("PPM requiere dos tipos de gap")
+                return None
+            bits = gaps[internal] > (gap_centers[0] + gap_centers[1]) / 2
+            bit_message = pulse_message[:-1][internal]
+
+        else:
+            if len(pulse_centers) == 0:
+                print("Manchester requiere un tipo de pulso dominante (medio bit)")
+                return None
+            bits, bit_message, bad_pairs = self._manchester_bits(
+                pulses, gaps, separators, pulse_message, pulse_centers[0])
+            bad_messages[bit_message[bad_pairs]] = True
+
+        decoded = self._pack_message_bits(encoding, bits, bit_message, n_messages, ~bad_messages)
+        self.decoded_messages = decoded
+        self._print_decoded(decoded)
+
+        return decoded
+
+    @profiled('frames')
+    def index_frames(self):
+        """
+        Segmenta el tren en mensajes y agrupa los repetidos en tramas unicas
+
+        Cada mensaje (delimitado por los gaps separadores) se cuantiza a los
+        centros de sus grupos de duracion redondeados a FRAME_QUANTUM_US, de
+        modo que las repeticiones con jitter dan la misma secuencia. Los
+        mensajes de igual longitud se comparan de una vez con np.unique y solo
+        las secuencias unicas se hashean; la clave no depende de la captura,
+        asi que comparar tramas entre capturas es una busqueda en un dict.
+
+        Returns:
+            dict: Clave -> UniqueFrame, en orden de primera aparicion
+                  (None si no hay pulsos)
+        """
+        self.frames = None
+        n_pulses = len(self.pulse_data)
+        if n_pulses == 0:
+            return None
+
+        n_gaps = n_pulses - 1
+        pulse_message, _ = self._message_ids(n_gaps)
+
+        # Secuencia intercalada p0, g0, p1, ... cuantizada a los centros de grupo
+        symbols = np.empty(2 * n_pulses - 1, dtype=np.int64)
+        symbols[0::2] = self.pulse_clusters.centers[self.pulse_clusters.labels]
+        symbols[1::2] = self.gap_clusters.centers[self.gap_clusters.labels[:n_gaps]]
+        symbols = (np.rint(symbols / FRAME_QUANTUM_US) * FRAME_QUANTUM_US).astype(np.int32)
+
+        # Instante de inicio (μs) de cada pulso y primer pulso de cada mensaje
+        periods = self.pulse_data[:n_gaps].astype(np.int64) + self.gap_data[:n_gaps]
+        pulse_start = np.concatenate(([0], np.cumsum(periods)))
+        first_pulse = np.flatnonzero(np.diff(pulse_message, prepend=-1))
+        lengths = np.diff(np.append(first_pulse, n_pulses))
+
+        found = []
+        for length in np.unique(lengths).tolist():
+            members = np.flatnonzero(lengths == length)
+            rows = symbols[2 * first_pulse[members, None] + np.arange(2 * length - 1)]
+            unique_rows, first, inverse, counts = np.unique(
+                rows, axis=0, return_index=True, return_inverse=True, return_counts=True)
+
+            last = np.zeros(len(unique_rows), dtype=np.int64)
+            np.maximum.at(last, inverse.reshape(-1), members)
+
+            for row, first_member, last_message, count in zip(
+                    unique_rows, members[first], last, counts.tolist()):
+                key = hashlib.blake2b(row.tobytes(), digest_size=8).hexdigest()
+                found.append((first_member, UniqueFrame(
+                    key, row[0::2], row[1::2], count,
+                    int(pulse_start[first_pulse[first_member]]),
+                    int(pulse_start[first_pulse[last_message]]),
+                )))
+
+        found.sort(key=lambda item: item[0])
+        self.frames = {frame.key: frame for _, frame in found}
+        self._print_frames(len(first_pulse))
+
+        return self.frames
+
+    def _print_frames(self, n_messages):
+        """Muestra las tramas unicas y sus repeticiones"""
+        print(f"\n=== TRAMAS ({len(self.frames)} unicas de {n_messages} mensajes) ===")
+        for i, frame in enumerate(list(self.frames.values())[:DECODE_PRINT_LIMIT]):
+            print(f"   [{i}] {frame.key} x{frame.count}, {len(frame.pulses)} pulsos, "
+                  f"{frame.first_us / 1000:.1f} - {frame.last_us / 1000:.1f}ms")
+        if len(self.frames) > DECODE_PRINT_LIMIT:
+            print(f"   ... {len(self.frames) - DECODE_PRINT_LIMIT} tramas mas")
+
+    def _message_ids(self, n_gaps):
+        """Mensaje al que pertenece cada pulso y mascara de gaps separadores"""
+        separators = np.zeros(n_gaps, dtype=bool)
+        if self.message_structure:
+            separator_label = len(self.gap_clusters.centers) - 1
+            separators = self.gap_clusters.labels[:n_gaps] == separator_label
+
+        pulse_message = np.zeros(n_gaps + 1, dtype=np.int64)
+        np.cumsum(separators, out=pulse_message[1:])
+
+        return pulse_message, separators
+
+    def _main_centers(self, durations):
+        """Centros de los dos grupos mas frecuentes (ordenados por duracion)"""
+        centers, counts, _ = self._cluster_durations(durations)
+        main = counts >= max(1, DECODE_MAIN_SHARE * len(durations))
+        top = np.argsort(counts[main], kind='stable')[::-1][:2]
+        return np.sort(centers[main][top]).astype(np.float64)
+
+    def _detect_line_code(self, pulses, gaps, internal, pulse_centers, gap_centers):
+        """Deduce la codificacion por la cantidad y relacion de los grupos"""
+        if len(pulse_centers) >= 2 and len(gap_centers) <= 1:
+            return 'pwm'
+        if len(pulse_centers) <= 1 and len(gap_centers) >= 2:
+            return 'ppm'
+        if len(pulse_centers) < 2:
+            return None
+
+        # PWM: periodo pulso + gap aproximadamente constante
+        periods = pulses[:-1][internal] + gaps[internal]
+        if len(periods) and periods.std() < 0.15 * periods.mean():
+            return 'pwm'
+
+        # Manchester: duraciones de 1 y 2 medios bits, mismo medio bit en pulsos y gaps
+        pulse_ratio = pulse_centers[1] / pulse_centers[0]
+        gap_ratio = gap_centers[1] / gap_centers[0]
+        same_unit = abs(gap_centers[0] - pulse_centers[0]) < 0.3 * pulse_centers[0]
+        if 1.6 < pulse_ratio < 2.4 and 1.6 < gap_ratio < 2.4 and same_unit:
+            return 'manchester'
+
+        return 'pwm'
+
+    def _manchester_bits(self, pulses, gaps, separators, pulse_message, half_bit_us):
+        """
+        Expande pulsos y gaps a medios bits y los decodifica por pares
+
+        Returns:
+            tuple: (bits, mensaje de cada bit, pares invalidos)
+        """
+        n_pulses = len(pulses)
+
+        # Secuencia alternada alto/bajo: p0 g0 p1 g1 ... pN
+        levels = np.zeros(2 * n_pulses - 1, dtype=np.uint8)
+        levels[0::2] = 1
+        halves = np.empty(2 * n_pulses - 1, dtype=np.int64)
+        halves[0::2] = np.rint(pulses / half_bit_us)
+        halves[1::2] = np.where(separators, 1, np.rint(gaps / half_bit_us))
+        element_message = np.empty(2 * n_pulses - 1, dtype=np.int64)
+        element_message[0::2] = pulse_message
+        element_message[1::2] = pulse_message[:-1]
+
+        # Duraciones fuera de 1-2 medios bits invalidan el mensaje
+        out_of_range = (halves < 1) | (halves > 2)
+        halves = np.clip(halves, 1, 2)
+
+        # Medio bit bajo inicial de cada mensaje y final del ultimo
+        starts = np.concatenate(([0], 2 * np.flatnonzero(separators) + 2))
+        n_messages = len(starts)
+        levels = np.append(np.insert(levels, starts, 0), 0)
+        halves = np.append(np.insert(halves, starts, 1), 1)
+        element_message = np.append(np.insert(element_message, starts, np.arange(n_messages)),
+                                    n_messages - 1)
+        out_of_range = np.append(np.insert(out_of_range, starts, False), False)
+
+        half_bits = np.repeat(levels, halves)
+        half_message = np.repeat(element_message, halves)
+        half_bad = np.repeat(out_of_range, halves)
+
+        # Pares dentro de cada mensaje, en las dos alineaciones posibles
+        message_start = np.searchsorted(half_message, np.arange(n_messages))
+        position = np.arange(len(half_bits)) - message_start[half_message]
+        first = np.flatnonzero(half_message[1:] == half_message[:-1])
+        bad_pairs = (half_bits[first] == half_bits[first + 1]) | half_bad[first] | half_bad[first + 1]
+        parity = position[first] % 2
+
+        # Por mensaje: alineacion impar (primer pulso = primera mitad) si tiene menos errores
+        pair_message = half_message[first]
+        bad_even = np.bincount(pair_message[bad_pairs & (parity == 0)], minlength=n_messages)
+        bad_odd = np.bincount(pair_message[bad_pairs & (parity == 1)], minlength=n_messages)
+        keep = parity == (bad_odd < bad_even)[pair_message]
+
+        first = first[keep]
+        return half_bits[first + 1], pair_message[keep], bad_pairs[keep]
+
+    def _pack_message_bits(self, encoding, bits, bit_message, n_messages, valid):
+        """Empaqueta los bits de cada mensaje en una fila de bytes (MSB primero)"""
+        bit_counts = np.bincount(bit_message, minlength=n_messages)
+        starts = np.concatenate(([0], np.cumsum(bit_counts)[:-1]))
+        position = np.arange(len(bits)) - starts[bit_message]
+
+        width = max(8, -(-int(bit_counts.max()) // 8) * 8)
+        grid = np.zeros((n_messages, width), dtype=np.uint8)
+        grid[bit_message, position] = bits
+
+        return DecodedMessages(encoding, bit_counts, np.packbits(grid, axis=1), valid)
+
+    def _print_decoded(self, decoded):
+        """Muestra los mensajes decodificados en hexadecimal"""
+        print(f"\n=== DECODIFICACION ({decoded.encoding.upper()}) ===")
+        print(f"Mensajes: {len(decoded.bit_counts)} ({int(decoded.valid.sum())} validos)")
+
+        hex_messages = message_hex(decoded)
+        for i in range(min(len(hex_messages), DECODE_PRINT_LIMIT)):
+            flag = '' if decoded.valid[i] else ' (invalido)'
+            print(f"   [{i}] {decoded.bit_counts[i]} bits: {hex_messages[i]}{flag}")
+
+        if len(hex_messages) > DECODE_PRINT_LIMIT:
+            print(f"   ... {len(hex_messages) - DECODE_PRINT_LIMIT} mensajes mas")
+
+    def _cluster_durations(self, durations, tolerance=0.15, min_tolerance_us=20):
+        """
+        Agrupa duraciones similares ordenando una sola vez (O(n log n))
+
+        Sobre las duraciones ordenadas cada grupo parte de su primera (menor)
+        duracion: la referencia es la mediana de las que caen dentro de la
+        tolerancia max(duracion * tolerance, min_tolerance_us) de esa primera,
+        y el grupo abarca hasta referencia + su tolerancia (la regla
+        referencia +- tolerancia original). El ancho queda acotado a unas dos
+        tolerancias, sin encadenar vecinas, y los searchsorted son por grupo,
+        no por duracion.
+
+        Args:
+            durations (ndarray): Duraciones en μs
+            tolerance (float): Tolerancia relativa respecto a la referencia
+            min_tolerance_us (int): Tolerancia minima absoluta en μs
+
+        Returns:
+            DurationClusters: centros, cuentas y etiqueta por duracion
+        """
+        durations = np.asarray(durations)
+        n_durations = len(durations)
+
+        if n_durations == 0:
+            empty = np.empty(0, dtype=np.int32)
+            return DurationClusters(empty, np.empty(0, dtype=np.int64), empty)
+
+        order = np.argsort(durations, kind='stable')
+        sorted_durations = durations[order]
+
+        starts = self._cluster_starts(sorted_durations, tolerance, min_tolerance_us)
+        counts = np.diff(np.append(starts, n_durations))
+        sums = np.add.reduceat(sorted_durations.astype(np.int64), starts)
+        centers = (sums // counts).astype(np.int32)
+
+        labels = np.empty(n_durations, dtype=np.int32)
+        labels[order] = np.repeat(np.arange(len(starts), dtype=np.int32), counts)
+
+        return DurationClusters(centers, counts, labels)
+
+    def _cluster_starts(self, sorted_values, tolerance=0.15, min_tolerance_us=20, cumulative=None):
+        """
+        Indice del primer valor de cada grupo sobre valores ordenados
+
+        Regla de _cluster_durations. Con cumulative (cuentas acumuladas de
+        cada valor) sorted_values son valores unicos con peso y la mediana de
+        la ventana se pondera: mismos grupos que con los valores repetidos.
+        """
+        starts = []
+        start = 0
+        while start < len(sorted_values):
+            starts.append(start)
+            first = sorted_values[start]
+            window = int(np.searchsorted(sorted_values, first + max(first * tolerance, min_tolerance_us), 'right'))
+
+            # Mediana de la ventana (referencia del grupo)
+            if cumulative is None:
+                middle = (start + window - 1) // 2
+            else:
+                before = cumulative[start - 1] if start else 0
+                middle = np.searchsorted(cumulative, before + (cumulative[window - 1] - before + 1) // 2)
+            reference = sorted_values[middle]
 
-                if regular_gaps and longest_gap > max(regular_gaps) * 2:
-                    separators = gap_groups[longest_gap]
-                    messages = separators + 1
-                    bits_per_msg = len(self.pulse_data) // messages
+            start = int(np.searchsorted(sorted_values, reference + max(reference * tolerance, min_tolerance_us),
+                                        'right'))
 
-                    print(f"Estructura detectada:")
-                    print(f"   Mensajes: {messages}")
-                    print(f"   Separadores: {separators} de {longest_gap:,}μs")
-                    print(f"   Bits por mensaje: ~{bits_per_msg}")
+        return np.array(starts, dtype=np.intp)
 
     def _group_durations(self, durations, tolerance=0.15):
-        """Agrupa duraciones similares"""
-        if not durations:
-            return {}
+        """Agrupa duraciones similares ({duracion promedio: cantidad})"""
+        centers, counts, _ = self._cluster_durations(durations, tolerance)
+        return dict(zip(centers.tolist(), counts.tolist()))
+
+    def stream_analyze(self, stream, threshold_factor=3.0, min_pulse_samples=10,
+                       separator_us=5000, resolution_us=0):
+        """
+        Analiza IQ cu8 en vivo desde un stream (stdin o FIFO)
+
+        Procesa cada lectura (hasta STREAM_BLOCK_SEC de muestras) en cuanto
+        llega: amplitud, threshold adaptativo y pulsos se calculan de forma
+        incremental, y cada mensaje se imprime en cuanto su gap separador
+        supera separator_us, sin esperar al siguiente pulso.
+
+        Args:
+            stream: Objeto binario con readinto (p.ej. sys.stdin.buffer)
+            threshold_factor (float): Factor para threshold automatico
+            min_pulse_samples (int): Minimo de muestras para pulso valido
+            separator_us (int): Gap minimo que separa mensajes (μs)
+            resolution_us (float): Decimar la envolvente a esta resolucion (0 = no)
+
+        Returns:
+            int: Numero de mensajes emitidos
+        """
+        self.decimation = self._decimation_factor(resolution_us)
+        min_pulse_samples = max(1, round(min_pulse_samples / self.decimation))
+
+        block_samples = max(1024, int(self.sample_rate * STREAM_BLOCK_SEC))
+        lut = magnitude_lut(np.uint8)  # Resolucion de 1 unidad: histograma pequenio
+        tracker = StreamThreshold(int(lut.max()) + 1, threshold_factor,
+                                  self.sample_rate * STREAM_HISTORY_SEC / self.decimation)
+
+        us_per_sample = self.time_per_sample * self.decimation * 1e6
+        separator_samples = separator_us / us_per_sample
+        remainder = np.empty(0, dtype=np.uint8)  # Muestras pendientes de decimar
+
+        buffer = bytearray(block_samples * 2)
+        view = memoryview(buffer)
+        read = getattr(stream, 'readinto1', stream.readinto)
+        filled = 0
+        offset = 0
+
+        # Estado entre bloques
+        prev_high = None
+        pending_rise = None  # Flanco de subida de un pulso aun abierto
+        last_fall = -np.inf  # Fin del ultimo pulso valido
+        message_pulses = []
+        message_gaps = []  # Gap previo a cada pulso del mensaje
+        message_start = 0
+        messages = 0
+
+        print(f"\n=== STREAMING ===")
+        print(f"Bloque: {block_samples:,} muestras, Separador: {separator_us:,}μs")
+
+        def emit():
+            nonlocal messages
+            pulses = (np.concatenate(message_pulses) * us_per_sample).astype(np.int32)
+            gaps = (np.concatenate(message_gaps)[1:] * us_per_sample).astype(np.int32)
+            message_pulses.clear()
+            message_gaps.clear()
+            messages += 1
+
+            train = ' '.join(f"{p}/{g}" for p, g in zip(pulses.tolist(), gaps.tolist()))
+            train = f"{train} {pulses[-1]}".strip()
+            print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] "
+                  f"#{messages} t={message_start * us_per_sample / 1e6:.3f}s "
+                  f"pulsos={len(pulses)}: {train}", flush=True)
+
+        while True:
+            count = read(view[filled:])
+            if not count:
+                break
+
+            filled += count
+            usable = filled // 2 * 2
+            if usable == 0:
+                continue
+
+            amplitude = np.take(lut, np.frombuffer(buffer, dtype=np.uint16, count=usable // 2))
+
+            # Conservar el byte IQ incompleto para el siguiente bloque
+            leftover = filled - usable
+            buffer[:leftover] = buffer[usable:filled]
+            filled = leftover
+
+            if self.decimation > 1:
+                amplitude = np.concatenate((remainder, amplitude))
+                usable_samples = len(amplitude) // self.decimation * self.decimation
+                remainder = amplitude[usable_samples:]
+                amplitude = boxcar_decimate(amplitude[:usable_samples], self.decimation)
+                if len(amplitude) == 0:
+                    continue
+
+            block_end = offset + len(amplitude)
+
+            threshold = tracker.update(amplitude)
+            if threshold is None:
+                signal_high = np.zeros(len(amplitude), dtype=bool)
+            else:
+                signal_high = amplitude > threshold
+
+            rising, falling, prev_high = self._find_edges(signal_high, offset, prev_high)
+            offset = block_end
+
+            # Emparejar flancos con el pulso que quedo abierto
+            if pending_rise is not None:
+                rising = np.concatenate(([pending_rise], rising))
+                pending_rise = None
+            elif len(falling) and (len(rising) == 0 or falling[0] < rising[0]):
+                falling = falling[1:]
 
-        groups = {}
-        remaining = list(durations)
+            if len(rising) > len(falling):
+                pending_rise = int(rising[-1])
+                rising = rising[:-1]
 
-        while remaining:
-            reference = remaining.pop(0)
-            group = [reference]
+            valid = (falling - rising) >= min_pulse_samples
+            rising = rising[valid]
+            falling = falling[valid]
 
-            # Buscar duraciones similares
-            to_remove = []
-            for duration in remaining:
-                if abs(duration - reference) <= max(reference * tolerance, 20):  # 20μs minimo
-                    group.append(duration)
-                    to_remove.append(duration)
+            if len(rising):
+                gaps_before = rising - np.concatenate(([last_fall], falling[:-1]))
+                pulses = falling - rising
+                last_fall = int(falling[-1])
 
-            # Remover agrupadas
-            for duration in to_remove:
-                remaining.remove(duration)
+                # Cortar mensajes en los gaps separadores del bloque
+                start = 0
+                for split in np.flatnonzero(gaps_before > separator_samples).tolist() + [None]:
+                    if split is not None and split == start and not message_pulses:
+                        message_start = int(rising[split])
+                        continue
 
-            # Promedio del grupo
-            avg_duration = int(sum(group) / len(group))
-            groups[avg_duration] = len(group)
+                    message_pulses.append(pulses[start:split])
+                    message_gaps.append(gaps_before[start:split])
 
-        return dict(sorted(groups.items()))
+                    if split is not None:
+                        emit()
+                        message_start = int(rising[split])
+                        start = split
 
+                if sum(len(part) for part in message_pulses) >= STREAM_MAX_PULSES:
+                    emit()
+
+            # El separador ya se cumplio: emitir sin esperar al proximo pulso
+            if message_pulses and pending_rise is None and block_end - last_fall > separator_samples:
+                emit()
+
+        if message_pulses:
+            emit()
+
+        print(f"Stream finalizado: {offset * self.decimation:,} muestras, {messages} mensajes")
+        return messages
+
+    @profiled('replay_signal')
     def replay_signal(self, repetitions=1, delay_between_reps=0.1):
         """
         Reproduce la senial extraida en el GPIO
@@ -242,11 +2273,18 @@ class CU8ReplayDevice:
             repetitions (int): Numero de veces a repetir toda la secuencia
             delay_between_reps (float): Pausa entre repeticiones completas (segundos)
         """
-        if not self.pulse_data:
+        if len(self.pulse_data) == 0:
             print("No hay datos de pulsos para reproducir")
             return False
 
-        total_duration = sum(self.pulse_data) + sum(self.gap_data)
+        total_duration = int(self.pulse_train.buffer.sum(dtype=np.int64))
+
+        if not self.gpio_enabled:
+            self.setup_gpio()
+            print(f"GPIO {self.gpio_pin} configurado para transmision")
+
+        # Niveles y esperas (s) precalculados: pulso HIGH, gap LOW, ..., pulso HIGH
+        schedule = list(zip(itertools.cycle((GPIO.HIGH, GPIO.LOW)), self.pulse_train.schedule()))
 
         print(f"\n=== REPRODUCIENDO ===")
         print(f"Pulsos: {len(self.pulse_data)}, Gaps: {len(self.gap_data)}")
@@ -260,19 +2298,14 @@ class CU8ReplayDevice:
 
                 start_time = time.time()
 
-                # Transmitir secuencia
-                for i in range(len(self.pulse_data)):
-                    # Pulso HIGH
-                    GPIO.output(self.gpio_pin, GPIO.HIGH)
-                    time.sleep(self.pulse_data[i] / 1_000_000)
-
-                    # Gap LOW (si existe)
-                    if i < len(self.gap_data):
-                        GPIO.output(self.gpio_pin, GPIO.LOW)
-                        time.sleep(self.gap_data[i] / 1_000_000)
+                with self.profiler.stage('transmit', self.pulse_train.nbytes):
+                    # Transmitir secuencia
+                    for level, delay in schedule:
+                        GPIO.output(self.gpio_pin, level)
+                        time.sleep(delay)
 
-                # Asegurar LOW final
-                GPIO.output(self.gpio_pin, GPIO.LOW)
+                    # Asegurar LOW final
+                    GPIO.output(self.gpio_pin, GPIO.LOW)
 
                 elapsed = time.time() - start_time
                 print(f"{elapsed*1000:.1f}ms")
@@ -282,6 +2315,7 @@ class CU8ReplayDevice:
                     time.sleep(delay_between_reps)
 
             print(f"Transmision completada: {datetime.now().strftime('%H:%M:%S')}")
+            self._print_replay_timing()
             return True
 
         except KeyboardInterrupt:
@@ -293,11 +2327,182 @@ class CU8ReplayDevice:
         finally:
             GPIO.output(self.gpio_pin, GPIO.LOW)
 
+    def replay_timing(self):
+        """
+        Fidelidad temporal del ultimo replay (solo con el backend simulado)
+
+        Returns:
+            dict: Jitter y deriva frente a pulse_data/gap_data, o None
+        """
+        if not isinstance(GPIO, SimulatedGPIO):
+            return None
+
+        return GPIO.timing_stats(self.pulse_data, self.gap_data, self.gpio_pin)
+
+    def _print_replay_timing(self):
+        """Muestra jitter y deriva del replay si el pin es simulado"""
+        stats = self.replay_timing()
+        if stats is None:
+            return
+
+        print(f"\n=== FIDELIDAD TEMPORAL (GPIO simulado) ===")
+        print(f"Flancos: {stats['edges']} en {stats['repetitions']} repeticiones")
+        print(f"Error por flanco: medio {stats['error_mean_us']:+.1f}μs, jitter {stats['jitter_us']:.1f}μs")
+        print(f"|Error| p50/p99/max: {stats['error_p50_us']:.1f} / {stats['error_p99_us']:.1f} / "
+              f"{stats['error_max_us']:.1f}μs")
+        print(f"Deriva por repeticion: {stats['drift_us']:+.1f}μs ({stats['drift_ppm']:+.0f} ppm)")
+
     def cleanup(self):
         """Limpia recursos GPIO"""
+        if not self.gpio_enabled:
+            return
+
         GPIO.cleanup()
         print(f"GPIO limpiado")
 
+
+def find_captures(pattern):
+    """Lista ordenada de capturas cu8 de un directorio o patron glob"""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*.cu8')
+
+    return sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+
+
+def analyze_capture(task):
+    """
+    Analiza una captura sin GPIO ni salida por consola (worker de batch)
+
+    Args:
+        task (tuple): (archivo, kwargs de CU8ReplayDevice, kwargs de load_and_analyze_cu8)
+
+    Returns:
+        dict: Resultado serializable a JSON
+    """
+    filename, device_options, analysis_options = task
+    result = {'file': filename}
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    try:
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            device = CU8ReplayDevice(init_gpio=False, **device_options)
+            ok = device.load_and_analyze_cu8(filename, **analysis_options)
+
+        result['ok'] = ok
+        result['samples'] = os.path.getsize(filename) // 2
+        result['pulses'] = len(device.pulse_data)
+        result['gaps'] = len(device.gap_data)
+        result['pulse_clusters'] = [
+            {'us': center, 'count': count}
+            for center, count in zip(device.pulse_clusters.centers.tolist(),
+                                     device.pulse_clusters.counts.tolist())
+        ]
+        result['gap_clusters'] = [
+            {'us': center, 'count': count}
+            for center, count in zip(device.gap_clusters.centers.tolist(),
+                                     device.gap_clusters.counts.tolist())
+        ]
+        result['structure'] = device.message_structure
+
+        if device.profiler.enabled:
+            result['profile'] = device.profiler.report()
+
+        if device.channel_trains is not None:
+            result['channels'] = [
+                {'offset_hz': round(train.channel.offset_hz), 'bandwidth_hz': round(train.channel.bandwidth_hz),
+                 'snr_db': round(train.channel.snr_db, 1), 'decimation': train.decimation,
+                 'pulses': len(train.pulse_train), 'gaps': len(train.pulse_train.gaps),
+                 'structure': train.message_structure}
+                for train in device.channel_trains
+            ]
+
+        if device.frames is not None:
+            result['frames'] = [
+                {'key': frame.key, 'count': frame.count, 'pulses': len(frame.pulses),
+                 'first_us': frame.first_us, 'last_us': frame.last_us}
+                for frame in device.frames.values()
+            ]
+
+        if device.decoded_messages is not None:
+            decoded = device.decoded_messages
+            result['decoded'] = {
+                'encoding': decoded.encoding,
+                'messages': [
+                    {'bits': bits, 'hex': data, 'valid': valid}
+                    for bits, data, valid in zip(decoded.bit_counts.tolist(),
+                                                 message_hex(decoded),
+                                                 decoded.valid.tolist())
+                ],
+            }
+
+    except Exception as e:
+        result['ok'] = False
+        result['error'] = str(e)
+
+    result['timing'] = {
+        'wall_sec': round(time.perf_counter() - wall_start, 4),
+        'cpu_sec': round(time.process_time() - cpu_start, 4),
+    }
+
+    return result
+
+
+def batch_analyze(pattern, jobs, device_options, analysis_options):
+    """
+    Analiza en paralelo todas las capturas de un directorio o glob
+
+    Los resultados se escriben en stdout como NDJSON (una linea por archivo)
+    en el orden de la lista de archivos, a medida que van estando listos.
+
+    Args:
+        pattern (str): Directorio o patron glob de capturas
+        jobs (int): Procesos en paralelo (0 = todos los nucleos)
+        device_options (dict): Argumentos para CU8ReplayDevice
+        analysis_options (dict): Argumentos para load_and_analyze_cu8
+
+    Returns:
+        int: Numero de capturas analizadas con exito
+    """
+    files = find_captures(pattern)
+    if not files:
+        print(f"No se encontraron capturas en {pattern}", file=sys.stderr)
+        return 0
+
+    tasks = [(filename, device_options, analysis_options) for filename in files]
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(files)))
+
+    print(f"Batch: {len(files)} capturas, {jobs} procesos", file=sys.stderr)
+
+    # multiprocessing solo se importa en modo batch (arranque mas rapido)
+    from concurrent.futures import ProcessPoolExecutor
+
+    start_time = time.perf_counter()
+    successes = 0
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # map conserva el orden de entrada: salida determinista
+        for result in executor.map(analyze_capture, tasks):
+            successes += result['ok']
+            print(json.dumps(result, separators=(',', ':')), flush=True)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Batch completado: {successes}/{len(files)} en {elapsed:.2f}s", file=sys.stderr)
+
+    return successes
+
+
+def write_profile(report, destination):
+    """Escribe el informe del profiler como JSON en un archivo o stderr ('-')"""
+    if destination == '-':
+        print(json.dumps(report), file=sys.stderr)
+        return
+
+    with open(destination, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Perfil guardado en {destination}")
+
 def main():
     parser = argparse.ArgumentParser(
         description='Replay RF 433MHz desde archivo cu8',
@@ -308,10 +2513,14 @@ Ejemplos:
   python3 cu8_replay.py signal.cu8 -p 22 -r 5        # Pin 22, 5 repeticiones
   python3 cu8_replay.py signal.cu8 -t 2.5 -s 1000000 # Threshold 2.5, 1MHz
   python3 cu8_replay.py signal.cu8 --analyze-only     # Solo analisis, no transmitir
+  python3 cu8_replay.py signal.cu8 --sweep            # Buscar mejores -t / --min-pulse
+  rtl_sdr -f 433.92M -s 250k - | python3 cu8_replay.py -  # Analisis en vivo
+  python3 cu8_replay.py captures/ --batch -j 4 > out.ndjson  # Analisis en lote
         """
     )
 
-    parser.add_argument('cu8_file', help='Archivo cu8 a procesar')
+    parser.add_argument('cu8_file',
+                       help="Archivo cu8 a procesar ('-' para stdin, directorio o glob con --batch)")
     parser.add_argument('-p', '--pin', type=int, default=18,
                        help='Pin GPIO del transmisor (default: 18)')
     parser.add_argument('-r', '--repetitions', type=int, default=1,
@@ -324,26 +2533,116 @@ Ejemplos:
                        help='Pausa entre repeticiones seg (default: 0.1)')
     parser.add_argument('--min-pulse', type=int, default=10,
                        help='Minimo muestras por pulso (default: 10)')
+    parser.add_argument('--resolution', type=float, default=0,
+                       help='Decimar la envolvente a esta resolucion us (default: 0, sin decimar)')
+    parser.add_argument('--adaptive-window', type=float, default=0,
+                       help='Threshold adaptativo por ventanas de N seg (default: 0, global)')
+    parser.add_argument('--hysteresis', type=float, default=HYSTERESIS,
+                       help=f'Banda de histeresis relativa al threshold, p. ej. 0.2 (default: {HYSTERESIS})')
+    parser.add_argument('--channelize', action='store_true',
+                       help='Separar transmisores por frecuencia (STFT) y analizar cada canal')
+    parser.add_argument('--channel', type=int,
+                       help='Canal a usar con --channelize, por orden de SNR (default: el mas fuerte)')
+    parser.add_argument('--dedup', action='store_true',
+                       help='Agrupar mensajes repetidos en tramas unicas (hash por secuencia)')
+    parser.add_argument('--decode', choices=('auto',) + LINE_CODES,
+                       help='Decodificar mensajes a bits/hex (auto detecta PWM/PPM/Manchester)')
+    parser.add_argument('--sweep', action='store_true',
+                       help='Evaluar una rejilla de -t y --min-pulse en un solo analisis y proponer la mejor')
+    parser.add_argument('--sweep-thresholds', default=','.join(map(str, SWEEP_THRESHOLDS)),
+                       help=f"Factores de threshold del barrido (default: {','.join(map(str, SWEEP_THRESHOLDS))})")
+    parser.add_argument('--sweep-min-pulse', default=','.join(map(str, SWEEP_MIN_PULSES)),
+                       help=f"Pulsos minimos del barrido (default: {','.join(map(str, SWEEP_MIN_PULSES))})")
+    parser.add_argument('--threshold-subsample', type=int, default=1,
+                       help='Estimar threshold con 1 de cada N muestras (default: 1)')
+    parser.add_argument('--amplitude-dtype', choices=['uint8', 'uint16'], default='uint16',
+                       help='Precision de la amplitud del LUT IQ (default: uint16)')
+    parser.add_argument('--gpio-backend', choices=GPIO_BACKENDS, default='rpi',
+                       help='Backend GPIO: rpi o sim (pin simulado, mide jitter/deriva) (default: rpi)')
     parser.add_argument('--analyze-only', action='store_true',
                        help='Solo analizar, no transmitir')
+    parser.add_argument('--stream', action='store_true',
+                       help='Analizar en vivo desde stdin o FIFO (implicito con -)')
+    parser.add_argument('--separator', type=int, default=5000,
+                       help='Gap minimo entre mensajes en streaming us (default: 5000)')
+    parser.add_argument('--cache', action='store_true',
+                       help='Reutilizar pulsos ya extraidos de la misma captura y parametros')
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                       help=f'Directorio de la cache (default: {CACHE_DIR})')
+    parser.add_argument('--cache-size', type=int, default=CACHE_MAX_MB,
+                       help=f'Tamanio maximo de la cache MB (default: {CACHE_MAX_MB})')
+    parser.add_argument('--batch', action='store_true',
+                       help='Analizar un directorio o glob de capturas en paralelo (NDJSON)')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                       help='Procesos para --batch (default: todos los nucleos)')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='JSON',
+                       help="Medir tiempo/CPU/memoria por etapa y escribir JSON ('-' = stderr)")
 
     args = parser.parse_args()
 
+    device_options = {
+        'sample_rate': args.sample_rate,
+        'amplitude_dtype': args.amplitude_dtype,
+        'profile': args.profile is not None,
+    }
+    analysis_options = {
+        'threshold_factor': args.threshold,
+        'min_pulse_samples': args.min_pulse,
+        'threshold_subsample': args.threshold_subsample,
+        'resolution_us': args.resolution,
+        'adaptive_window_sec': args.adaptive_window,
+        'hysteresis': args.hysteresis,
+        'dedup': args.dedup,
+        'decode': args.decode,
+        'channelize': args.channelize,
+        'channel': args.channel,
+    }
+    if args.cache:
+        analysis_options['cache'] = PulseCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+    # Analisis en lote: sin GPIO y con stdout reservado para NDJSON
+    # (con --profile cada linea incluye su clave 'profile')
+    if args.batch:
+        successes = batch_analyze(args.cu8_file, args.jobs, device_options, analysis_options)
+        return 0 if successes else 1
+
+    # Solo analisis, barrido o streaming: nunca se importa ni se toca el GPIO
+    analysis_only = args.analyze_only or args.stream or args.sweep or args.cu8_file == '-'
+
     print(f"=== CU8 REPLAY TOOL ===")
     print(f"Archivo: {args.cu8_file}")
-    print(f"GPIO: {args.pin}")
+    print(f"GPIO: {'no (solo analisis)' if analysis_only else args.pin}")
     print(f"Sample rate: {args.sample_rate:,} Hz")
 
     # Crear dispositivo
-    replay_device = CU8ReplayDevice(args.pin, args.sample_rate)
+    replay_device = CU8ReplayDevice(args.pin, init_gpio=not analysis_only,
+                                    gpio_backend=args.gpio_backend, **device_options)
 
     try:
+        # Analisis en vivo: no hay captura completa que reproducir
+        if args.stream or args.cu8_file == '-':
+            if args.cu8_file == '-':
+                replay_device.stream_analyze(sys.stdin.buffer, args.threshold, args.min_pulse,
+                                             args.separator, args.resolution)
+            else:
+                with open(args.cu8_file, 'rb') as stream:
+                    replay_device.stream_analyze(stream, args.threshold, args.min_pulse,
+                                                 args.separator, args.resolution)
+            return 0
+
+        # Barrido de parametros: solo informe, sin replay
+        if args.sweep:
+            results = replay_device.sweep_parameters(
+                args.cu8_file,
+                [float(factor) for factor in args.sweep_thresholds.split(',') if factor],
+                [int(min_pulse) for min_pulse in args.sweep_min_pulse.split(',') if min_pulse],
+                threshold_subsample=args.threshold_subsample, resolution_us=args.resolution,
+                adaptive_window_sec=args.adaptive_window, hysteresis=args.hysteresis,
+            )
+            return 0 if results else 1
+
         # Cargar y analizar
-        if not replay_device.load_and_analyze_cu8(
-            args.cu8_file,
-            args.threshold,
-            args.min_pulse
-        ):
+        if not replay_device.load_and_analyze_cu8(args.cu8_file, **analysis_options):
             print("Fallo en analisis del archivo")
             return 1
 
@@ -364,6 +2663,8 @@ Ejemplos:
         return 1
     finally:
         replay_device.cleanup()
+        if args.profile is not None:
+            write_profile(replay_device.profiler.report(), args.profile)
 
     return 0
 